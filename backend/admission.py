@@ -0,0 +1,112 @@
+import os
+import asyncio
+from collections import deque
+from dotenv import load_dotenv
+
+from redis.exceptions import RedisError
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+# Per worker: at most MAX_ACTIVE_CHATS graph runs at once (each holds Redis connections and a
+# DeepSeek stream), up to MAX_QUEUED_CHATS more wait in line with their position streamed back,
+# and anything beyond that is turned away with a 429 at once instead of timing out later.
+MAX_ACTIVE_CHATS = int(os.getenv("MAX_ACTIVE_CHATS", "24"))
+MAX_QUEUED_CHATS = int(os.getenv("MAX_QUEUED_CHATS", "48"))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "30"))              # Seconds a chat may wait for a slot
+QUEUE_UPDATE_INTERVAL = float(os.getenv("QUEUE_UPDATE_INTERVAL", "2"))
+
+# Per session, shared by every worker through Redis: SESSION_BURST questions at once, refilled
+# at SESSION_RATE_PER_MIN. Limiting fails open if Redis is unreachable.
+SESSION_RATE_PER_MIN = float(os.getenv("SESSION_RATE_PER_MIN", "10"))
+SESSION_BURST = int(os.getenv("SESSION_BURST", "5"))
+RATE_LIMIT_PREFIX = "janus:rl"
+
+# Refill, take one token, report how long until the next one. Redis's own clock keeps every
+# worker on the same timeline; the key expires once the bucket would be full again anyway.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1]) / 60000
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed, retry_ms = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_ms = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate) + 1000)
+return {allowed, retry_ms}
+"""
+
+class SessionRateLimiter:
+    def __init__(self, redis, rate_per_min: float = SESSION_RATE_PER_MIN, burst: int = SESSION_BURST):
+        self.rate_per_min, self.burst = rate_per_min, burst
+        self.script = redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def check(self, session_id: str) -> float:
+        """0 if the session may ask now, else seconds until it may."""
+        try:
+            allowed, retry_ms = await self.script(keys=[f"{RATE_LIMIT_PREFIX}:{session_id}"], args=[self.rate_per_min, self.burst])
+        except RedisError:
+            return 0.0
+        return 0.0 if allowed else retry_ms / 1000
+
+class Ticket:
+    def __init__(self):
+        self.admitted = asyncio.Event()
+
+class AdmissionController:
+    """
+    A FIFO semaphore with a bounded line. A finishing chat hands its slot straight to the head of
+    the line, so a burst drains in arrival order and nobody already waiting is overtaken.
+    """
+
+    def __init__(self, max_active: int = MAX_ACTIVE_CHATS, max_queued: int = MAX_QUEUED_CHATS):
+        self.max_active, self.max_queued = max_active, max_queued
+        self.active = 0
+        self.line = deque()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "rate_limited": 0, "abandoned": 0, "timed_out": 0}
+
+    def full(self) -> bool:
+        return self.active >= self.max_active and len(self.line) >= self.max_queued
+
+    def enter(self):
+        """An admitted or queued Ticket, or None when the line is full."""
+        ticket = Ticket()
+        if self.active < self.max_active and not self.line:
+            self.active += 1
+            self.stats["admitted"] += 1
+            ticket.admitted.set()
+        elif len(self.line) < self.max_queued:
+            self.line.append(ticket)
+            self.stats["queued"] += 1
+        else:
+            self.stats["rejected"] += 1
+            return None
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        return self.line.index(ticket) + 1 if ticket in self.line else 0
+
+    def leave(self, ticket: Ticket):
+        if not ticket.admitted.is_set():
+            if ticket in self.line:
+                self.line.remove(ticket)
+                self.stats["abandoned"] += 1
+            return
+        if self.line:
+            successor = self.line.popleft()
+            self.stats["admitted"] += 1
+            successor.admitted.set()
+        else:
+            self.active -= 1
+
+    def snapshot(self):
+        return {**self.stats, "active": self.active, "waiting": len(self.line), "max_active": self.max_active, "max_queued": self.max_queued}
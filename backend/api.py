@@ -1,19 +1,111 @@
 import os
+import math
+import time
+import uuid
+import asyncio
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
 from dotenv import load_dotenv
 
 # 1. UPDATED IMPORTS: Use the async saver and graph builder
 from langgraph.checkpoint.redis.aio import AsyncRedisSaver
-from graph import graph_builder 
+from langgraph.checkpoint.memory import InMemorySaver
+from graph import graph_builder, embeddings, embedding_batcher, kb_flight, web_flight, retrieval_cache, concept_index, HEAVY_CLIENTS, warm_up
+from redis_pool import create_redis_client, close_redis_client
+from cache import ANSWER_CACHE_ENABLED, IndexVersion, SemanticAnswerCache
+from singleflight import SINGLEFLIGHT_REDIS, RedisFlightBus
+from admission import QUEUE_TIMEOUT, QUEUE_UPDATE_INTERVAL, AdmissionController, SessionRateLimiter
+from telemetry import (
+    REQUESTS, current_trace, finish_trace, instrument_checkpointer, log_failure, observe, render_metrics, span, start_trace
+)
 
 load_dotenv()
 
-app = FastAPI(title="JANUS F1 MISSION CONTROL", version="2.0.0")
+# Build the embedding model, vector store and LLM client right after startup, off the event loop.
+# The port is bound in a few seconds either way; with 0 they load on the first request instead.
+WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "1") == "1"
+
+# CHECKPOINT_BACKEND=memory keeps threads in process memory: for local runs and benchmarks against a
+# Redis without the search module (threads are lost on restart and not shared between workers).
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "redis")
+
+# Seconds between attempts at the Redis-side setup while Redis is unreachable at boot
+REDIS_SETUP_RETRY = float(os.getenv("REDIS_SETUP_RETRY", "5"))
+
+# An agent turn's text is held back until it is this long. A turn that turns out to end in tool calls
+# ("Let me check the regulations…") is dropped instead of leaking into the answer ahead of the __LOG__ lines.
+STREAM_HOLD_CHARS = int(os.getenv("STREAM_HOLD_CHARS", "160"))
+
+# --- LIFECYCLE ---
+async def setup_redis(app: FastAPI, memory, answer_cache):
+    """
+    Checkpoint indexes, the answer cache index and the coalescing bus, retried until Redis answers.
+    Until then the worker serves degraded (no answer cache, no cross-worker coalescing, /chat fails on
+    the checkpointer) and /status reports redis: false, instead of failing boot and halting gunicorn.
+    """
+    while True:
+        flight_bus = RedisFlightBus(app.state.redis) if SINGLEFLIGHT_REDIS else None
+        try:
+            if CHECKPOINT_BACKEND != "memory":
+                await memory.asetup()
+            if answer_cache:
+                await answer_cache.setup()
+            if flight_bus:
+                await flight_bus.start()
+            break
+        except Exception as e:
+            if flight_bus:
+                await flight_bus.stop()
+            print(f"⚠️ Redis setup failed ({e}); retrying in {REDIS_SETUP_RETRY:g}s.")
+            await asyncio.sleep(REDIS_SETUP_RETRY)
+
+    app.state.answer_cache = answer_cache
+    if flight_bus:
+        app.state.flight_bus = kb_flight.bus = web_flight.bus = flight_bus
+    app.state.redis_ready = True
+
+# One pooled Redis client, one checkpointer and one compiled graph per worker, shared by every /chat stream.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    redis_client = create_redis_client()
+    memory = InMemorySaver() if CHECKPOINT_BACKEND == "memory" else AsyncRedisSaver(redis_client=redis_client)
+    instrument_checkpointer(memory)
+    app.state.redis = redis_client
+    app.state.graph = graph_builder.compile(checkpointer=memory)
+    app.state.index_version = IndexVersion(redis_client)
+    retrieval_cache.attach(redis_client, app.state.index_version)
+    answer_cache = None
+    if ANSWER_CACHE_ENABLED:
+        answer_cache = SemanticAnswerCache(
+            redis_client,
+            lambda text: asyncio.to_thread(embeddings.embed_query, text),
+            lambda text: concept_index().plan(text).years,
+            app.state.index_version,
+        )
+    app.state.answer_cache = None
+    app.state.flight_bus = None
+    app.state.redis_ready = False
+    redis_setup = asyncio.create_task(setup_redis(app, memory, answer_cache))
+
+    app.state.admission = AdmissionController()
+    app.state.rate_limiter = SessionRateLimiter(redis_client)
+    app.state.started_at = time.time()
+    app.state.open_streams = 0
+    app.state.warmup = asyncio.create_task(asyncio.to_thread(warm_up)) if WARM_ON_STARTUP else None
+    try:
+        yield
+    finally:
+        redis_setup.cancel()
+        if app.state.flight_bus:
+            await app.state.flight_bus.stop()
+        await close_redis_client(redis_client)
+
+app = FastAPI(title="JANUS F1 MISSION CONTROL", version="2.0.0", lifespan=lifespan)
 
 # --- PRODUCTION CORS ---
 origins = ["http://localhost:5173", "http://127.0.0.1:5173", os.getenv("FRONTEND_URL", "")]
@@ -23,56 +115,240 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
 class ChatRequest(BaseModel):
     message: str
     session_id: str
 
-SYSTEM_PROMPT = SystemMessage(content="""
-    You are **Janus 2.0**, the F1 Technical Director.
-    1. DEFAULT TO 2026: Prioritize new regs.
-    2. STRICT ISOLATION: Do not mix years unless comparing.
-    3. VISUALS: Use Markdown tables.
-    4. CITE: Use [Source: Filename | Year: 20XX].
-""")
+async def aclosing_iter(stream):
+    # Close the inner generator (and the graph run under it) the moment this one stops, not at GC
+    async with aclosing(stream) as parts:
+        async for part in parts:
+            yield part
+
+async def tracked(stream, request_id):
+    """
+    Runs one /chat stream under its request trace (telemetry.py): times every write to the client
+    and counts open streams; on SIGTERM the worker stops accepting and lets these finish (gunicorn_conf.py).
+    """
+    trace = start_trace(request_id)
+    app.state.open_streams += 1
+    started, first_byte = time.perf_counter(), None
+    try:
+        async for part in aclosing_iter(stream):
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            written = time.perf_counter()
+            yield part
+            elapsed = time.perf_counter() - written
+            trace.write_seconds += elapsed
+            observe("stream", "write", elapsed, emit_json=False)
+    except (GeneratorExit, asyncio.CancelledError):
+        trace.outcome = "disconnected"
+        raise
+    finally:
+        app.state.open_streams -= 1
+        finish_trace(trace, first_byte, time.perf_counter() - started)
+
+async def admitted(stream):
+    """Holds a chat slot for the stream, streaming the queue position while it waits for one."""
+    admission = app.state.admission
+    ticket = admission.enter()
+    if ticket is None:
+        current_trace.get().outcome = "rejected"
+        yield "__LOG__⛔ UPLINK SATURATED. RETRY SHORTLY.\n"
+        return
+    try:
+        if not ticket.admitted.is_set():
+            queued_at = time.perf_counter()
+            deadline = queued_at + QUEUE_TIMEOUT
+            while not ticket.admitted.is_set():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    admission.stats["timed_out"] += 1
+                    current_trace.get().outcome = "queue_timeout"
+                    yield "__LOG__⛔ UPLINK SATURATED. RETRY SHORTLY.\n"
+                    return
+                yield f"__LOG__⏳ UPLINK BUSY. QUEUE POSITION {admission.position(ticket)}...\n"
+                try:
+                    await asyncio.wait_for(ticket.admitted.wait(), min(QUEUE_UPDATE_INTERVAL, remaining))
+                except asyncio.TimeoutError:
+                    pass
+            observe("admission", "queue_wait", time.perf_counter() - queued_at)
+        async for part in aclosing_iter(stream):
+            yield part
+    finally:
+        admission.leave(ticket)
+
+def overloaded(message: str, retry_after: float, outcome: str, request_id: str):
+    """Immediate 429: costs no graph run, no checkpoint read and no LLM call."""
+    REQUESTS.labels(outcome).inc()
+    return PlainTextResponse(
+        f"__LOG__⛔ {message}\n", status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after))), "X-Request-ID": request_id},
+    )
 
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     async def event_generator():
-        # CRITICAL FIX: Use 'async with' to correctly initialize the Redis connection lifecycle.
-        # This yields the actual checkpointer object required by the compiler.
-        REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
-        
-        async with AsyncRedisSaver.from_conn_string(REDIS_URL) as memory:
-            # Compile the graph using the active checkpointer instance
-            compiled_graph = graph_builder.compile(checkpointer=memory)
-            
-            config = {"configurable": {"thread_id": request.session_id}}
-            yield "__LOG__📡 ESTABLISHING UPLINK...\n"
-            
-            inputs = {"messages": [SYSTEM_PROMPT, HumanMessage(content=request.message)]}
-            
+        # The checkpointer and compiled graph live for the whole worker (see lifespan), so the
+        # first telemetry line goes out without any connection setup or graph compilation.
+        started = time.perf_counter()
+        compiled_graph = app.state.graph
+        answer_cache = app.state.answer_cache
+        config = {"configurable": {"thread_id": request.session_id}}
+        yield "__LOG__📡 ESTABLISHING UPLINK...\n"
+
+        # --- SEMANTIC CACHE ---
+        # Only opening questions are cached: a follow-up ("and in 2025?") depends on thread history
+        # that a near-duplicate question from another session does not share.
+        cache_key = None
+        if answer_cache:
             try:
-                # Use the stream from the locally compiled graph
-                async for chunk in compiled_graph.astream(inputs, config=config, stream_mode="updates"):
-                    if "agent" in chunk:
+                state = await compiled_graph.aget_state(config)
+                if not state.values.get("messages"):
+                    cache_key = (await answer_cache.scope(request.message), await answer_cache.embed(request.message))
+                    with span("cache", "answer_lookup"):
+                        hit = await answer_cache.lookup(*cache_key)
+                    if hit:
+                        current_trace.get().outcome = "cache_hit"
+                        yield "__LOG__⚡ ANSWER CACHE HIT. SKIPPING TELEMETRY SWEEP...\n"
+                        yield hit["answer"]
+                        answer_cache.record_saved(hit, time.perf_counter() - started)
+                        # Keep the thread coherent so follow-ups see the cached exchange
+                        await compiled_graph.aupdate_state(
+                            config,
+                            {"messages": [HumanMessage(content=request.message), AIMessage(content=hit["answer"])]},
+                            as_node="compact",
+                        )
+                        return
+            except Exception:
+                log_failure("CACHE")
+                cache_key = None
+        
+        # The system prompt is applied by agent_node on every call; it is never stored in the thread
+        inputs = {"messages": [HumanMessage(content=request.message)]}
+        
+        # Telemetry lines must start on a fresh line, even when they interrupt a streamed answer.
+        at_line_start = True
+        def log(text):
+            return ("" if at_line_start else "\n") + f"__LOG__{text}\n"
+
+        tools_used, final_answer = set(), ""
+        held, streaming, muted = "", set(), set()   # This turn's held-back text, and its streaming / tool-call message ids
+        try:
+            # aclosing: if the client goes away, the graph run (and the DeepSeek stream) is cancelled with it
+            async with aclosing(compiled_graph.astream(inputs, config=config, stream_mode=["messages", "updates"])) as events:
+                async for mode, chunk in events:
+                    if mode == "messages":
+                        # Token-level deltas from agent_node, forwarded as soon as the turn is known to be an answer
+                        token, metadata = chunk
+                        if metadata.get("langgraph_node") != "agent" or not isinstance(token, AIMessageChunk):
+                            continue
+                        if token.tool_call_chunks:
+                            muted.add(token.id)
+                            held = ""
+                        if token.id in muted or not isinstance(token.content, str) or not token.content:
+                            continue
+                        text = token.content
+                        if token.id not in streaming:
+                            held += text
+                            if len(held) < STREAM_HOLD_CHARS:
+                                continue
+                            text, held = held, ""
+                            streaming.add(token.id)
+                        yield text
+                        at_line_start = text.endswith("\n")
+                    elif "agent" in chunk:
                         msg = chunk["agent"]["messages"][-1]
-                        if msg.tool_calls:
-                            for t in msg.tool_calls:
-                                yield f"__LOG__🔍 ANALYZING {t['args'].get('target_year', 2026)} REGS...\n"
-                        elif msg.content:
-                            yield msg.content
+                        for t in msg.tool_calls:
+                            tools_used.add(t["name"])
+                            years = concept_index().plan(t['args'].get('query', ''), t['args'].get('target_year')).years
+                            yield log(f"🔍 ANALYZING {'/'.join(map(str, years))} REGS...")
+                            at_line_start = True
+                        if not msg.tool_calls:
+                            final_answer = msg.content
+                            if held:
+                                # A short answer: it never reached the hold threshold, so it goes out whole
+                                yield held
+                                at_line_start = held.endswith("\n")
+                        held = ""
+                        streaming.clear()
+                        muted.clear()
                     elif "tools" in chunk:
-                        yield "__LOG__✅ DATA SECURED.\n"
-            except Exception as e:
-                import traceback
-                print("\n--- [JANUS TELEMETRY FAILURE] ---")
-                traceback.print_exc() 
-                print("---------------------------------\n")
-                yield f"\n[CRITICAL ERROR: {str(e)}]"
-
-    return StreamingResponse(event_generator(), media_type="text/plain")
+                        yield log("✅ DATA SECURED.")
+                        at_line_start = True
+        except Exception as e:
+            log_failure("TELEMETRY")
+            current_trace.get().outcome = "error"
+            yield f"\n[CRITICAL ERROR: {str(e)}]"
+            return
+
+        # Only regulation answers are reusable; live news from search_web goes stale within hours.
+        if cache_key and final_answer and tools_used == {"search_knowledge_base"}:
+            try:
+                await answer_cache.store(*cache_key, request.message, final_answer, time.perf_counter() - started)
+            except Exception:
+                log_failure("CACHE")
+
+    request_id = http_request.headers.get("x-request-id") or uuid.uuid4().hex[:12]
+
+    # --- ADMISSION ---
+    # Shed load before any work: a full line or a session over its rate gets a 429 it can retry on.
+    admission = app.state.admission
+    if admission.full():
+        admission.stats["rejected"] += 1
+        return overloaded("UPLINK SATURATED. RETRY SHORTLY.", QUEUE_UPDATE_INTERVAL, "rejected", request_id)
+    retry_after = await app.state.rate_limiter.check(request.session_id)
+    if retry_after:
+        admission.stats["rate_limited"] += 1
+        return overloaded(f"RATE LIMIT: TOO MANY QUESTIONS. RETRY IN {math.ceil(retry_after)}s.", retry_after, "rate_limited", request_id)
+
+    return StreamingResponse(
+        tracked(admitted(event_generator()), request_id), media_type="text/plain", headers={"X-Request-ID": request_id}
+    )
+
+@app.api_route("/status", methods=["GET", "HEAD"])
+async def status():
+    """Readiness probe (and the keep-warm cron's target): 200 once Redis answers and every heavy client is built or missing."""
+    try:
+        redis_ok = app.state.redis_ready and bool(await asyncio.wait_for(app.state.redis.ping(), timeout=2))
+    except Exception:
+        redis_ok = False
+    # A missing parent store or lexical index only degrades retrieval, so it is reported but does not fail readiness
+    clients = {name: "missing" if client.missing else client.ready for name, client in HEAVY_CLIENTS.items()}
+    warmup = app.state.warmup
+    body = {
+        "ready": redis_ok and all(clients.values()),
+        "redis": redis_ok,
+        "clients": clients,
+        "open_streams": app.state.open_streams,
+        "admission": app.state.admission.snapshot(),
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - app.state.started_at, 1),
+    }
+    if warmup is not None and warmup.done() and not warmup.cancelled() and warmup.exception():
+        body["warmup_error"] = str(warmup.exception())
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus exposition: per-stage latency histograms, request outcomes, agent loops per turn."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    answer_cache = app.state.answer_cache
+    return {
+        "answer_cache": answer_cache.snapshot() if answer_cache else None,
+        "query_embeddings": {**embeddings.stats, "size": len(embeddings.entries)},
+        "embedding_batcher": embedding_batcher.snapshot(),
+        "retrieval_cache": retrieval_cache.stats,
+        "singleflight": {"search_knowledge_base": kb_flight.stats, "search_web": web_flight.stats},
+    }
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,211 @@
+"""
+Offline end-to-end load test of /chat: real api.py + graph.py, local stand-ins for everything else.
+
+    python benchmarks/chat_load.py --sessions 60 --turns 3 --concurrency 20 --out results.json
+    python benchmarks/chat_load.py --corpus corpus.json ...          # replay an earlier corpus
+    python benchmarks/chat_load.py --redis-url redis://localhost:6379  # Redis Stack: real checkpointer + answer cache
+
+The app is served by uvicorn in this process, with DeepSeek, Pinecone, DuckDuckGo and MiniLM
+replaced by benchmarks/standins.py (latencies and token rate are flags). Without --redis-url,
+Redis is fakeredis and threads are checkpointed in memory (CHECKPOINT_BACKEND=memory); the
+semantic answer cache needs Redis Stack and is off in that mode.
+
+Each session is a multi-turn conversation drawn from concepts.txt (seeded, so --corpus-out /
+--corpus replay it exactly). Reports, as one JSON document:
+  throughput      turns/s over the whole run
+  ttfb_ms         time to the first byte of each turn's stream
+  ttlb_ms         time to the last byte
+  tool_calls      per turn, counted from the ANALYZING telemetry lines
+  llm_calls       per turn (agent node runs: 1 + tool round trips), from the server's /metrics
+  memory          RSS before/after and peak, for this process (server + load generator)
+  cache_stats     the server's /cache/stats at the end
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import statistics
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+CONCEPTS_PATH = os.path.join(BACKEND_DIR, "concepts.txt")
+
+OPENERS = [
+    "What are the {year} rules for {term}?",
+    "How does {synonym} differ between 2025 and 2026?",
+    "Explain {synonym} under the {year} regulations.",
+    "Any latest news on {term} from the teams?",
+]
+FOLLOW_UPS = [
+    "And what about {synonym} in {year}?",
+    "Which article covers {synonym}?",
+    "Compare that with the 2025 {term} rules.",
+]
+
+def build_corpus(concepts, sessions, turns, seed):
+    rng = random.Random(seed)
+    def fill(template):
+        term, synonyms = rng.choice(concepts)
+        return template.format(term=term, synonym=rng.choice(synonyms), year=rng.choice([2022, 2024, 2025, 2026]))
+    return [
+        [fill(rng.choice(OPENERS))] + [fill(rng.choice(FOLLOW_UPS)) for _ in range(turns - 1)]
+        for _ in range(sessions)
+    ]
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+def summary(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return {"p50": round(pick(50), 1), "p95": round(pick(95), 1), "p99": round(pick(99), 1), "mean": round(statistics.mean(ordered), 1)}
+
+async def one_turn(client, url, session_id, message):
+    started = time.perf_counter()
+    first = None
+    body = []
+    async with client.stream("POST", f"{url}/chat", json={"message": message, "session_id": session_id}) as response:
+        async for chunk in response.aiter_text():
+            if first is None:
+                first = time.perf_counter()
+            body.append(chunk)
+    text = "".join(body)
+    return {
+        "ttfb_ms": ((first or time.perf_counter()) - started) * 1000,
+        "ttlb_ms": (time.perf_counter() - started) * 1000,
+        "tool_calls": text.count("🔍 ANALYZING"),
+        "ok": response.status_code == 200 and "[CRITICAL ERROR" not in text,
+    }
+
+async def drive(url, corpus, concurrency, timeout):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    turns = []
+
+    async def session(n, questions):
+        async with semaphore:
+            session_id = f"load-{n}-{time.time_ns()}"
+            for message in questions:
+                try:
+                    turns.append(await one_turn(client, url, session_id, message))
+                except httpx.HTTPError:
+                    turns.append({"ok": False})
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(session(n, q) for n, q in enumerate(corpus)))
+        wall = time.perf_counter() - started
+        stats = (await client.get(f"{url}/cache/stats")).json()
+        stats["agent_loops"] = metric_totals((await client.get(f"{url}/metrics")).text, "janus_agent_loops")
+    return turns, wall, stats
+
+def metric_totals(exposition, name):
+    """{"sum": ..., "count": ...} of one Prometheus histogram in a text exposition."""
+    totals = {}
+    for line in exposition.splitlines():
+        for field in ("sum", "count"):
+            if line.startswith(f"{name}_{field} "):
+                totals[field] = float(line.split()[-1])
+    return totals
+
+async def main(args):
+    # The service reads these at import time
+    os.environ["WARM_ON_STARTUP"] = "0"
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    else:
+        os.environ["CHECKPOINT_BACKEND"] = "memory"
+        os.environ["ANSWER_CACHE_ENABLED"] = "0"
+
+    import uvicorn
+    import graph
+    import api
+    from standins import StandInConfig, install, load_concepts
+
+    if not args.redis_url:
+        from fakeredis import FakeAsyncRedis
+        api.create_redis_client = lambda: FakeAsyncRedis()
+
+    config = StandInConfig(
+        llm_ttft_ms=args.llm_ttft_ms, llm_tokens_per_s=args.llm_tokens_per_s, answer_tokens=args.answer_tokens,
+        kb_latency_ms=args.kb_latency_ms, web_latency_ms=args.web_latency_ms, real_embeddings=args.real_embed,
+    )
+    install(graph, config, CONCEPTS_PATH)
+
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = json.load(f)
+    else:
+        corpus = build_corpus(load_concepts(CONCEPTS_PATH), args.sessions, args.turns, args.seed)
+    if args.corpus_out:
+        with open(args.corpus_out, "w") as f:
+            json.dump(corpus, f, indent=1)
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=args.port, log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    rss_before = rss_mb()
+    try:
+        turns, wall, cache_stats = await drive(f"http://127.0.0.1:{args.port}", corpus, args.concurrency, args.timeout)
+    finally:
+        server.should_exit = True
+        await serving
+
+    ok = [t for t in turns if t["ok"]]
+    loops = cache_stats.pop("agent_loops")
+    result = {
+        "config": {**vars(args), **vars(config)},
+        "sessions": len(corpus),
+        "turns": len(turns),
+        "errors": len(turns) - len(ok),
+        "wall_seconds": round(wall, 3),
+        "throughput_turns_per_s": round(len(ok) / wall, 2) if wall else 0.0,
+        "ttfb_ms": summary([t["ttfb_ms"] for t in ok]),
+        "ttlb_ms": summary([t["ttlb_ms"] for t in ok]),
+        "tool_calls": {
+            "per_turn_mean": round(statistics.mean(t["tool_calls"] for t in ok), 2) if ok else 0.0,
+            "per_turn_max": max((t["tool_calls"] for t in ok), default=0),
+        },
+        "llm_calls": {
+            "per_turn_mean": round(loops["sum"] / loops["count"], 2) if loops.get("count") else 0.0,
+        },
+        "memory": {"rss_mb_before": rss_before, "rss_mb_after": rss_mb(), "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)},
+        "cache_stats": cache_stats,
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive /chat offline with stand-in services and report latency, throughput and memory.")
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session (1 opener + follow-ups).")
+    parser.add_argument("--concurrency", type=int, default=20, help="Sessions in flight at once.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="Replay sessions from a JSON file written by --corpus-out.")
+    parser.add_argument("--corpus-out", help="Write the generated sessions here.")
+    parser.add_argument("--out", help="Also write the result JSON here.")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--redis-url", help="Use this Redis (Stack) instead of fakeredis + in-memory checkpoints.")
+    parser.add_argument("--real-embed", action="store_true", help="Use MiniLM instead of the fake embedder.")
+    parser.add_argument("--llm-ttft-ms", type=float, default=400)
+    parser.add_argument("--llm-tokens-per-s", type=float, default=60)
+    parser.add_argument("--answer-tokens", type=int, default=180)
+    parser.add_argument("--kb-latency-ms", type=float, default=80)
+    parser.add_argument("--web-latency-ms", type=float, default=600)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,163 @@
+"""
+Regulation text per turn: the old 1000/100 recursive splitter vs. article-aware child/parent chunks.
+
+    python benchmarks/chunk_tokens.py                      # LlamaParse output cached by ingest.py (.ingest/parsed)
+    python benchmarks/chunk_tokens.py --synthetic 40       # generated C-section regulations, no ingest needed
+
+Both chunkings are indexed with the same BM25 retriever (lexical.py, k=8) so only the chunking
+differs. For each article a question is asked from its title words; per chunking it reports, as
+one JSON document: chunk count and size, Markdown tables cut across chunks, and per question the
+context handed to the LLM (tokens at ~4 chars each, as graph.estimate_tokens counts them), chunks
+in it, and how often the asked-for article made it in whole.
+"""
+import os
+import sys
+import glob
+import json
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import graph
+from chunking import HEADING_PATTERN, ParentStore, split_regulation
+from lexical import LexicalIndex
+
+WORDS = ("floor plank skid wing endplate diffuser beam flap mass ballast tyre rim brake duct sensor fuel flow "
+         "battery cell harness hoop nose impact cockpit mirror camera radius surface volume deflection load").split()
+
+def synthetic_regulation(sections, seed):
+    """Markdown shaped like LlamaParse output of Section C: numbered articles, clauses, tables, page breaks."""
+    rng = random.Random(seed)
+    lines, titles = [], {}
+    for s in range(1, sections + 1):
+        lines += [f"## ARTICLE C{s}: {' '.join(rng.sample(WORDS, 2)).upper()}", ""]
+        for a in range(1, rng.randint(3, 6)):
+            article = f"C{s}.{a}"
+            titles[article] = " ".join(rng.sample(WORDS, 3))
+            lines += [f"{article} {titles[article].title()}", ""]
+            for c in range(1, rng.randint(2, 5)):
+                clause = " ".join(
+                    f"The {rng.choice(WORDS)} {rng.choice(WORDS)} must not exceed {rng.randint(5, 900)}mm when measured along the {rng.choice(WORDS)} axis."
+                    for _ in range(rng.randint(1, 6))
+                )
+                lines += [f"{article}.{c} {clause}", ""]
+            if rng.random() < 0.4:
+                lines += ["| Parameter | Minimum | Maximum |", "|---|---|---|"]
+                lines += [f"| {titles[article]} {r} | {rng.randint(1, 50)} | {rng.randint(51, 900)} |" for r in range(rng.randint(4, 12))]
+                lines.append("")
+    # LlamaParse returns one text per page; pages end wherever the PDF did, tables included
+    pages, page = [], []
+    for line in lines:
+        page.append(line)
+        if sum(len(l) for l in page) > 2800:
+            pages.append("\n".join(page))
+            page = []
+    pages.append("\n".join(page))
+    return [pages], titles
+
+def parsed_corpus(ingest_dir):
+    corpora = []
+    for path in sorted(glob.glob(os.path.join(ingest_dir, "parsed", "*.json"))):
+        with open(path) as f:
+            corpora.append(json.load(f))
+    return corpora
+
+def article_titles(corpora):
+    titles = {}
+    for pages in corpora:
+        for line in "\n".join(pages).splitlines():
+            match = HEADING_PATTERN.match(line)
+            if match and match.group(1) and match.group(1).count(".") == 1:
+                words = line[match.end(2) if match.group(2) else match.end(1):].strip(" *#:.-")
+                if len(words.split()) >= 2:
+                    titles.setdefault(match.group(1).upper(), words.lower())
+    return titles
+
+def tables_in(corpora):
+    tables = []
+    for pages in corpora:
+        current = []
+        for line in "\n".join(pages).splitlines():
+            if line.lstrip().startswith("|"):
+                current.append(line)
+            elif line.strip() and current:
+                tables.append(current)
+                current = []
+        if current:
+            tables.append(current)
+    return tables
+
+def cut_tables(tables, chunks):
+    """Tables whose rows do not all land in one chunk."""
+    texts = [c.page_content for c in chunks]
+    return sum(1 for rows in tables if not any(all(r in t for r in rows) for t in texts))
+
+def evaluate(name, chunks, retrieve, titles, tables):
+    per_turn = []
+    for article, title in titles.items():
+        context = retrieve(f"What are the rules on {title}?")
+        text = "\n".join(d.page_content for d in context)
+        per_turn.append({"tokens": len(text) // 4, "chunks": len(context), "hit": f"{article} " in text or f"{article}\n" in text})
+    tokens = sorted(t["tokens"] for t in per_turn)
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "chunk_chars_mean": round(statistics.mean(len(c.page_content) for c in chunks), 1),
+        "tables_cut": cut_tables(tables, chunks),
+        "tables": len(tables),
+        "context_tokens_per_turn": {"mean": round(statistics.mean(tokens), 1), "p50": tokens[len(tokens) // 2], "max": tokens[-1]},
+        "context_chunks_per_turn": round(statistics.mean(t["chunks"] for t in per_turn), 2),
+        "article_hit_rate": round(sum(t["hit"] for t in per_turn) / len(per_turn), 3),
+    }
+
+def main(args):
+    if args.synthetic:
+        corpora, titles = synthetic_regulation(args.synthetic, args.seed)
+    else:
+        corpora = parsed_corpus(args.ingest_dir)
+        if not corpora:
+            sys.exit(f"No parsed pages under {args.ingest_dir}/parsed: run ingest.py first, or pass --synthetic N.")
+        titles = article_titles(corpora)
+    tables = tables_in(corpora)
+    documents = [[Document(page_content=p, metadata={"source": f"doc{i}", "year": 2026}) for p in pages] for i, pages in enumerate(corpora)]
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    recursive = [c for pages in documents for c in splitter.split_documents(pages)]
+    recursive_index = LexicalIndex.build(recursive)
+
+    children, parents = [], {}
+    for pages in documents:
+        file_children, file_parents = split_regulation(pages)
+        children += file_children
+        parents.update(file_parents)
+    child_index = LexicalIndex.build(children)
+    store_path = os.path.join(tempfile.mkdtemp(), "parents.sqlite")
+    ParentStore.write(parents, store_path)
+    store = ParentStore(store_path)
+    graph.parent_store = graph.Lazy(lambda: store)
+
+    results = [
+        evaluate("recursive-1000-100", recursive, lambda q: recursive_index.search(q, k=args.k), titles, tables),
+        evaluate("articles (children -> parents)", children, lambda q: graph.expand_parents(child_index.search(q, k=args.k)), titles, tables),
+    ]
+    before, after = (r["context_tokens_per_turn"]["mean"] for r in results)
+    print(json.dumps({
+        "questions": len(titles),
+        "parents": len(parents),
+        "results": results,
+        "token_reduction": round(1 - after / before, 3) if before else 0.0,
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare recursive and article-aware chunking by context tokens per turn.")
+    parser.add_argument("--ingest-dir", default=os.getenv("INGEST_STATE_DIR", ".ingest"))
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many sections instead of reading parsed pages.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=graph.RETRIEVAL_K, help="Chunks retrieved per question (before parent expansion).")
+    main(parser.parse_args())
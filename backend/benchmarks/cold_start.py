@@ -0,0 +1,93 @@
+"""
+Cold start: import time, first-embedding time and (optionally) time to a ready server.
+
+    python benchmarks/cold_start.py --backends torch onnx
+    python benchmarks/cold_start.py --backends torch onnx --server     # needs REDIS_URL + API keys
+
+Every measurement runs in a fresh interpreter, so nothing is warm except the OS page cache
+(run once first to fill it, as the container's second boot would).
+  import_seconds       `import api`: what uvicorn pays before it can bind the port
+  first_embed_seconds  first query embedding: model load + one forward pass
+  warm_embed_ms        a second, uncached query embedding
+With --server it also starts uvicorn and reports seconds until /status answers at all, until it
+returns 200 (every heavy client built), and the TTFB / total time of the first /chat request.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import api, graph
+imported = time.perf_counter()
+graph.embedding_model().embed_query("What is the 2026 minimum mass?")
+embedded = time.perf_counter()
+graph.embedding_model().embed_query("How wide is the 2026 front wing?")
+print(json.dumps({
+    "import_seconds": round(imported - started, 3),
+    "first_embed_seconds": round(embedded - imported, 3),
+    "warm_embed_ms": round((time.perf_counter() - embedded) * 1000, 2),
+}))
+"""
+
+def probe(backend):
+    env = {**os.environ, "EMBEDDING_BACKEND": backend, "WARM_ON_STARTUP": "0"}
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def server(backend, port, message, timeout):
+    env = {**os.environ, "EMBEDDING_BACKEND": backend, "WARM_ON_STARTUP": "1"}
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {}
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    code = client.get(f"{url}/status").status_code
+                except httpx.TransportError:
+                    time.sleep(0.05)
+                    continue
+                result.setdefault("bound_seconds", round(time.perf_counter() - started, 3))
+                if code == 200:
+                    result["ready_seconds"] = round(time.perf_counter() - started, 3)
+                    break
+                time.sleep(0.1)
+
+            sent = time.perf_counter()
+            with client.stream("POST", f"{url}/chat", json={"message": message, "session_id": f"cold-{time.time()}"}) as response:
+                for line in response.iter_lines():
+                    if line.startswith("__LOG__"):
+                        result.setdefault("first_request_ttfb_ms", round((time.perf_counter() - sent) * 1000, 1))
+            result["first_request_seconds"] = round(time.perf_counter() - sent, 3)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import, model-load and first-request latency.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], choices=["torch", "onnx"])
+    parser.add_argument("--server", action="store_true", help="Also boot uvicorn and time /status and the first /chat.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--message", default="What is the 2026 minimum mass?")
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        row = {"backend": backend, **probe(backend)}
+        if args.server:
+            row.update(server(backend, args.port, args.message, args.timeout))
+        print(json.dumps(row))
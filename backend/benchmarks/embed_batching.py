@@ -0,0 +1,85 @@
+"""
+Query-embedding throughput and latency, unbatched vs. micro-batched, at rising concurrency.
+
+    python benchmarks/embed_batching.py --concurrency 1 4 20 50 --queries 400
+    python benchmarks/embed_batching.py --fake-embed      # cost model only, no MiniLM
+
+Each "chat" is a thread embedding distinct regulation questions back to back, as the
+retrieval threads do. Output is one JSON line per (mode, concurrency): embeddings/s,
+p50/p99 latency per query and, for the batcher, its mean batch size and queue wait.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from embedding_model import EMBED_BATCH_WINDOW_MS, EMBED_MAX_BATCH, EmbeddingBatcher, load_embedding_model
+
+TOPICS = ["minimum mass", "front wing width", "power unit fuel flow", "DRS activation", "plank wear", "tyre blankets", "ERS deployment", "floor edge"]
+
+class FakeModel:
+    """Fixed per-call overhead plus a small per-query cost: roughly MiniLM's shape on CPU."""
+    def __init__(self, overhead_ms=6.0, per_query_ms=0.4):
+        self.overhead, self.per_query = overhead_ms / 1000, per_query_ms / 1000
+        self.lock = threading.Lock()   # One forward pass at a time, like a saturated core pool
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        with self.lock:
+            time.sleep(self.overhead + self.per_query * len(texts))
+        return [[0.0] * 384 for _ in texts]
+
+def run(model, batching, concurrency, queries, window_ms, max_batch):
+    embedder = EmbeddingBatcher(lambda: model, max_batch=max_batch if batching else 1, window_ms=window_ms)
+    latencies, lock = [], threading.Lock()
+    per_chat = max(1, queries // concurrency)
+
+    def chat(n):
+        for i in range(per_chat):
+            start = time.perf_counter()
+            embedder.embed_query(f"What is the {TOPICS[(n + i) % len(TOPICS)]} rule in {2022 + i % 5}? (chat {n}, q {i})")
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=chat, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    row = {
+        "mode": "batched" if batching else "unbatched",
+        "concurrency": concurrency,
+        "embeddings_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 2),
+    }
+    if batching:
+        stats = embedder.snapshot()
+        row.update(mean_batch=stats["mean_batch"], queue_wait_ms=stats["queue_wait_ms"])
+    return row
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare unbatched and micro-batched query embedding.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 20, 50])
+    parser.add_argument("--queries", type=int, default=400, help="Total queries per run, split across the chats.")
+    parser.add_argument("--window-ms", type=float, default=EMBED_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=EMBED_MAX_BATCH)
+    parser.add_argument("--fake-embed", action="store_true", help="Use a sleep-based cost model instead of MiniLM.")
+    args = parser.parse_args()
+
+    model = FakeModel() if args.fake_embed else load_embedding_model()
+    model.embed_documents(["warm up"])
+    for concurrency in args.concurrency:
+        for batching in (False, True):
+            print(json.dumps(run(model, batching, concurrency, args.queries, args.window_ms, args.max_batch)))
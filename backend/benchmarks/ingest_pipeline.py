@@ -0,0 +1,118 @@
+"""
+Ingest wall time vs. worker count, against a local stub of the LlamaParse service.
+
+    python benchmarks/ingest_pipeline.py --files 40 --parse-latency 2.0 --workers 1 2 4 8
+
+Every run starts from an empty .ingest/ state in a scratch directory. Parsing is a stub that
+sleeps --parse-latency seconds and returns synthetic regulation markdown; Pinecone is a stub
+that sleeps --upsert-latency per request. Embeddings use the real MiniLM model unless
+--fake-embed is given. Output is one JSON line per worker count.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+import ingest
+
+PAGE = """
+## C{n}.1 Minimum mass
+The mass of the car, without fuel, must not be less than {mass} kg at all times during the Competition.
+
+| Component | Mass (kg) |
+|-----------|-----------|
+| Power Unit | 185 |
+| Tyres | {tyres} |
+
+C{n}.2 Ballast may be used provided it is secured in such a way that tools are required for its removal.
+"""
+
+class StubParser:
+    def __init__(self, latency, pages):
+        self.latency, self.pages = latency, pages
+
+    def load_data(self, filename):
+        time.sleep(self.latency)
+        seed = sum(map(ord, filename))
+        return [SimpleNamespace(text=PAGE.format(n=(seed + p) % 20, mass=700 + p, tyres=40 + seed % 7) * 3) for p in range(self.pages)]
+
+class StubIndex:
+    def __init__(self, latency):
+        self.latency, self.requests = latency, 0
+
+    def upsert(self, vectors, show_progress=False):
+        time.sleep(self.latency)
+        self.requests += 1
+
+    def delete(self, ids):
+        time.sleep(self.latency)
+
+class FakeEmbedder:
+    def __init__(self, processes=1, batch_size=64):
+        pass
+
+    def embed(self, texts):
+        return np.random.default_rng(len(texts)).random((len(texts), 384), dtype=np.float32)
+
+    def close(self):
+        pass
+
+def run_once(args, workers):
+    scratch = tempfile.mkdtemp(prefix="janus-ingest-")
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        names = [f"{2022 + i % 5}_regs_tech_stub{i:03d}.pdf" for i in range(args.files)]
+        for name in names:
+            with open(name, "w") as f:
+                f.write(name)
+
+        ingest.INGEST_DIR = os.path.join(scratch, ".ingest")
+        ingest.MANIFEST_PATH = os.path.join(ingest.INGEST_DIR, "manifest.json")
+        ingest._parser = StubParser(args.parse_latency, args.pages)
+        index = StubIndex(args.upsert_latency)
+
+        opts = SimpleNamespace(
+            parse_workers=workers,
+            embed_processes=workers,
+            embed_batch=args.embed_batch,
+            upsert_batch=args.upsert_batch,
+            upsert_workers=min(workers, 4),
+        )
+        started = time.perf_counter()
+        chunks, vectors, _ = ingest.run_pipeline(names, {"files": {}}, index, opts)
+        return {
+            "workers": workers,
+            "files": len(names),
+            "chunks": len(chunks),
+            "upsert_requests": index.requests,
+            "wall_seconds": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure ingest pipeline scaling with stub parse/upsert services.")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--parse-latency", type=float, default=1.0)
+    parser.add_argument("--upsert-latency", type=float, default=0.05)
+    parser.add_argument("--embed-batch", type=int, default=ingest.EMBED_BATCH)
+    parser.add_argument("--upsert-batch", type=int, default=ingest.UPSERT_BATCH)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--fake-embed", action="store_true", help="Skip the MiniLM model (measures orchestration only).")
+    args = parser.parse_args()
+
+    if args.fake_embed:
+        ingest.BatchEmbedder = FakeEmbedder
+    for workers in args.workers:
+        print(json.dumps(run_once(args, workers)))
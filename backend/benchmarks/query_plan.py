@@ -0,0 +1,62 @@
+"""
+What concepts.py resolves locally, and what it costs, over a chat_load corpus.
+
+    python benchmarks/query_plan.py --sessions 200 --turns 3
+    python benchmarks/query_plan.py --corpus corpus.json
+
+For every question: the years and era inferred, the concepts matched and the expansion queries
+search_knowledge_base would add. Reports, as one JSON document, the share of questions whose
+years / FIA wording were settled without the agent, and planning latency per question (the
+automaton is compiled once per worker; build time is reported separately).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from concepts import CONCEPTS_PATH, ConceptIndex
+from chat_load import build_corpus
+from standins import load_concepts
+
+def main(args):
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = json.load(f)
+    else:
+        corpus = build_corpus(load_concepts(CONCEPTS_PATH), args.sessions, args.turns, args.seed)
+    questions = [q for session in corpus for q in session]
+
+    started = time.perf_counter()
+    index = ConceptIndex.load(CONCEPTS_PATH)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    plans, latencies = [], []
+    for question in questions:
+        started = time.perf_counter()
+        plans.append(index.plan(question))
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+
+    result = {
+        "questions": len(questions),
+        "build_ms": round(build_ms, 2),
+        "plan_us": {"p50": round(statistics.median(latencies), 1), "p99": round(latencies[int(0.99 * (len(latencies) - 1))], 1)},
+        "with_concepts": round(sum(bool(p.concepts) for p in plans) / len(plans), 3),
+        "multi_year": round(sum(len(p.years) > 1 for p in plans) / len(plans), 3),
+        "expansions_per_question": round(statistics.mean(len(p.expansions) for p in plans), 2),
+        "examples": [{"question": p.query, "plan": p.header(), "expansions": p.expansions} for p in plans[:args.examples]],
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure local query planning (concepts.py) over a question corpus.")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="Questions from a JSON file written by chat_load.py --corpus-out.")
+    parser.add_argument("--examples", type=int, default=5)
+    main(parser.parse_args())
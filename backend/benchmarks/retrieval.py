@@ -0,0 +1,75 @@
+"""
+Dense-only vs hybrid retrieval on the article references in concepts.txt.
+
+    python ingest.py --target local          # once: local_index/ + local_index/lexical.json
+    python benchmarks/retrieval.py
+
+For every "Article X" in the cheat sheet it asks "What does Article X say?" and reports:
+  - latency per query for dense-only and hybrid retrieval
+  - hit@1: does the top chunk carry the requested article heading?
+  - vector calls: how many queries still needed an embedding + vector search
+A missed article on the first call is what sends the agent back for another tool round trip,
+so hit@1 is the offline proxy for tool calls per conversation.
+"""
+import os
+import re
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_huggingface import HuggingFaceEmbeddings
+from local_index import LOCAL_INDEX_DIR, LocalVectorIndex
+from lexical import LEXICAL_INDEX_PATH, LexicalIndex, hybrid_search
+
+CONCEPTS_PATH = os.path.join(os.path.dirname(__file__), "..", "concepts.txt")
+SEARCH_YEARS = [2026, 2025]
+K = 8
+
+def article_queries():
+    with open(CONCEPTS_PATH) as f:
+        articles = dict.fromkeys(re.findall(r"Article\s+([A-F]?\d+(?:\.\d+)*)", f.read()))
+    return [(f"What does Article {a} say?", a) for a in articles]
+
+def heads_article(doc, article):
+    heading = doc.metadata.get("article", "")
+    return heading == article or heading.startswith(article + ".")
+
+def main():
+    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    dense_index = LocalVectorIndex(LOCAL_INDEX_DIR, embeddings)
+    lexical = LexicalIndex.load(LEXICAL_INDEX_PATH)
+
+    class CountingStore:
+        """Counts the embedding + vector search round trips each strategy still makes."""
+        def __init__(self):
+            self.calls = 0
+
+        def similarity_search(self, query, k, filter):
+            self.calls += 1
+            return dense_index.similarity_search(query, k=k, filter=filter)
+
+    def dense(store, query):
+        return hybrid_search(store, None, query, SEARCH_YEARS, k=K)
+
+    def hybrid(store, query):
+        return hybrid_search(store, lexical, query, SEARCH_YEARS, k=K)
+
+    queries = article_queries()
+    dense(CountingStore(), queries[0][0])  # Warm the model before timing anything
+
+    for name, strategy in (("dense", dense), ("hybrid", hybrid)):
+        store, latencies, hits = CountingStore(), [], 0
+        for query, article in queries:
+            start = time.perf_counter()
+            results = strategy(store, query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += bool(results) and heads_article(results[0], article)
+        print(
+            f"{name:>6}: queries={len(queries)} hit@1={hits / len(queries):.0%} vector_calls={store.calls} "
+            f"p50={statistics.median(latencies):.2f}ms max={max(latencies):.2f}ms"
+        )
+
+if __name__ == "__main__":
+    main()
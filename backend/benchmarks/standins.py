@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the services behind /chat, with configurable latency and token rates.
+
+    from standins import StandInConfig, install
+    install(graph, StandInConfig(llm_ttft_ms=400, llm_tokens_per_s=60), "concepts.txt")
+
+They replace graph.py's lazy clients (see graph.Lazy) before the first request:
+  FakeDeepSeek      tool-calling chat model; plans tool calls like the real agent, then streams
+                    a cited Markdown answer token by token through the normal callback path
+  FakeVectorStore   Pinecone: embeds the query (through the real cache + batcher), then returns
+                    regulation-shaped chunks built from concepts.txt after a fixed latency
+  FakeWebSearch     DuckDuckGoSearchRun: fixed latency, canned snippet
+  FakeEmbeddings    MiniLM: deterministic unit vectors, per-pass overhead + per-query cost
+Used by benchmarks/chat_load.py; nothing here is imported by the service itself.
+"""
+import re
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Any, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+CONCEPT_PATTERN = re.compile(r"^\[(.+?)\]\s*=\s*(.+)$")
+YEAR_PATTERN = re.compile(r"\b(20[2-3]\d)\b")
+WEB_WORDS = ("news", "latest", "standings", "driver", "team")
+
+@dataclass
+class StandInConfig:
+    llm_ttft_ms: float = 400          # Think time before the first token / tool call
+    llm_tokens_per_s: float = 60
+    answer_tokens: int = 180
+    kb_latency_ms: float = 80         # One Pinecone query
+    web_latency_ms: float = 600       # One DuckDuckGo search
+    embed_overhead_ms: float = 6      # One MiniLM forward pass...
+    embed_per_query_ms: float = 0.4   # ...plus this per query in the batch
+    real_embeddings: bool = False     # Load MiniLM instead of FakeEmbeddings
+
+def load_concepts(path):
+    """[Term] = synonym, synonym, Article X  ->  [(term, [synonyms])]"""
+    concepts = []
+    with open(path) as f:
+        for line in f:
+            match = CONCEPT_PATTERN.match(line.strip())
+            if match:
+                concepts.append((match.group(1), [s.strip() for s in match.group(2).split(",")]))
+    return concepts
+
+# --- EMBEDDINGS ---
+class FakeEmbeddings:
+    def __init__(self, config: StandInConfig):
+        self.overhead, self.per_query = config.embed_overhead_ms / 1000, config.embed_per_query_ms / 1000
+        self.lock = threading.Lock()   # One forward pass at a time, like a model saturating the cores
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(384).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            time.sleep(self.overhead + self.per_query * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+# --- VECTOR STORE ---
+class FakeVectorStore:
+    def __init__(self, config: StandInConfig, concepts, embeddings):
+        self.latency = config.kb_latency_ms / 1000
+        self.embeddings = embeddings
+        self.docs = []
+        for year in range(2022, 2027):
+            for i, (term, synonyms) in enumerate(concepts):
+                body = (
+                    f"{synonyms[-1]} {term}: the {', '.join(synonyms[:-1]).lower() or term.lower()} of the car "
+                    f"must comply with the {year} Technical Regulations at all times during the Competition. "
+                ) * 4
+                table = f"\n| Parameter | {year} |\n|---|---|\n| {term} | {700 + 5 * i + year % 10} |\n"
+                self.docs.append(Document(page_content=body + table, metadata={
+                    "source": f"{year}_regs_tech_iss{1 + i % 3}.pdf", "year": year, "priority": 1 if i % 3 else 2,
+                }))
+
+    def similarity_search(self, query, k=8, filter=None):
+        self.embeddings.embed_query(query)
+        time.sleep(self.latency)
+        years = set((filter or {}).get("year", {}).get("$in", [])) or None
+        pool = [d for d in self.docs if years is None or d.metadata["year"] in years]
+        # Deterministic, query-dependent ranking, identical across runs
+        return sorted(pool, key=lambda d: hashlib.md5(f"{query}|{d.page_content[:48]}".encode("utf-8")).digest())[:k]
+
+    def similarity_search_by_vector(self, embedding, k=8, filter=None):
+        return self.similarity_search_by_vectors([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_by_vectors(self, embeddings, k=8, filter=None):
+        """Several pre-embedded queries in one round trip, like LocalVectorIndex."""
+        time.sleep(self.latency)
+        years = set((filter or {}).get("year", {}).get("$in", [])) or None
+        pool = [d for d in self.docs if years is None or d.metadata["year"] in years]
+        return [
+            sorted(pool, key=lambda d: hashlib.md5(np.asarray(vector, dtype=np.float32).tobytes()[:64] + d.page_content[:48].encode("utf-8")).digest())[:k]
+            for vector in embeddings
+        ]
+
+# --- WEB SEARCH ---
+class FakeWebSearch:
+    def __init__(self, config: StandInConfig):
+        self.latency = config.web_latency_ms / 1000
+
+    def invoke(self, query):
+        time.sleep(self.latency)
+        return f"Latest paddock reports on {query}: teams confirm compliance ahead of the next Grand Prix."
+
+# --- LLM ---
+def plan_tool_calls(question: str):
+    """What the real agent does with a fresh question: one KB search per year, web for live topics."""
+    years = sorted({int(y) for y in YEAR_PATTERN.findall(question)}) or [2026]
+    calls = [("search_knowledge_base", {"query": question, "target_year": y}) for y in years]
+    if any(word in question.lower() for word in WEB_WORDS):
+        calls.append(("search_web", {"query": question}))
+    return calls
+
+def compose_answer(tool_outputs: List[str], length: int) -> List[str]:
+    sources = [line for out in tool_outputs for line in out.splitlines() if line.startswith("SOURCE:")]
+    rows = [f"| {s.split('|')[0][8:].strip()} | {s.split('|')[1].strip()} |" for s in sources[:6]]
+    lead = "Per the finalized regulations, the requirement is summarised below.\n\n| Source | Year |\n|---|---|\n"
+    text = lead + "\n".join(rows) + "\n\n"
+    filler = "The article sets the limit and the conditions under which it is verified by the FIA . ".split()
+    words = text.split(" ") + [filler[i % len(filler)] for i in range(max(0, length - len(text.split(" "))))]
+    return [w + " " for w in words]
+
+class FakeDeepSeek(BaseChatModel):
+    """Drop-in for ChatDeepSeek.bind_tools(tools): first call plans tool calls, second streams the answer."""
+    ttft: float = 0.4
+    tokens_per_s: float = 60
+    answer_tokens: int = 180
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-deepseek"
+
+    def _reply(self, messages):
+        last_human = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        tool_outputs = [str(m.content) for m in messages[last_human:] if isinstance(m, ToolMessage)]
+        if tool_outputs:
+            return None, compose_answer(tool_outputs, self.answer_tokens)
+        calls = plan_tool_calls(str(messages[last_human].content))
+        return [
+            {"name": name, "args": json.dumps(args), "id": f"call_{uuid.uuid4().hex[:12]}", "index": i}
+            for i, (name, args) in enumerate(calls)
+        ], None
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.ttft)
+        tool_calls, tokens = self._reply(messages)
+        if tool_calls:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_calls))
+            if run_manager:
+                await run_manager.on_llm_new_token("", chunk=chunk)
+            yield chunk
+            return
+        for token in tokens:
+            await asyncio.sleep(1 / self.tokens_per_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        tool_calls, tokens = self._reply(messages)
+        if tool_calls:
+            message = AIMessage(content="", tool_calls=[
+                {"name": c["name"], "args": json.loads(c["args"]), "id": c["id"]} for c in tool_calls
+            ])
+        else:
+            message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+# --- WIRING ---
+def install(graph, config: StandInConfig, concepts_path: str):
+    """Swaps graph.py's lazy clients for the stand-ins. Call before the first request."""
+    concepts = load_concepts(concepts_path)
+    if not config.real_embeddings:
+        graph.embedding_model = graph.Lazy(lambda: FakeEmbeddings(config))
+        graph.embedding_batcher.load_model = graph.embedding_model
+    graph.vectorstore = graph.Lazy(lambda: FakeVectorStore(config, concepts, graph.embeddings))
+    graph.lexical_index = graph.Lazy(lambda: None)
+    graph.parent_store = graph.Lazy(lambda: None)
+    graph.ddg = graph.Lazy(lambda: FakeWebSearch(config))
+    graph.llm_with_tools = graph.Lazy(lambda: FakeDeepSeek(
+        ttft=config.llm_ttft_ms / 1000, tokens_per_s=config.llm_tokens_per_s, answer_tokens=config.answer_tokens,
+    ))
+    graph.HEAVY_CLIENTS.update({
+        "embeddings": graph.embedding_model, "vectorstore": graph.vectorstore, "lexical_index": graph.lexical_index,
+        "parent_store": graph.parent_store, "web_search": graph.ddg, "llm": graph.llm_with_tools,
+    })
+    return concepts
@@ -0,0 +1,59 @@
+"""
+Time-to-first-__LOG__ probe for /chat.
+
+    python benchmarks/ttfb.py --url http://localhost:8000 --requests 200 --concurrency 20
+
+Run it against the server before and after a change and compare the p50/p99 lines.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+async def first_log_latency(client: httpx.AsyncClient, url: str, message: str) -> float:
+    payload = {"message": message, "session_id": f"bench-{uuid.uuid4()}"}
+    start = time.perf_counter()
+    async with client.stream("POST", f"{url}/chat", json=payload) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("__LOG__"):
+                return time.perf_counter() - start
+    raise RuntimeError("Stream closed without a __LOG__ line")
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def main(args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples, failures = [], 0
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                try:
+                    samples.append(await first_log_latency(client, args.url, args.message))
+                except Exception:
+                    failures += 1
+
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    if not samples:
+        print(f"All {failures} requests failed.")
+        return
+    print(f"requests={len(samples)} failures={failures} concurrency={args.concurrency}")
+    print(f"TTFB p50: {percentile(samples, 50) * 1000:.1f} ms")
+    print(f"TTFB p99: {percentile(samples, 99) * 1000:.1f} ms")
+    print(f"TTFB mean: {statistics.mean(samples) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure p50/p99 time to the first __LOG__ line of /chat.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--message", default="What is the 2026 minimum mass?")
+    asyncio.run(main(parser.parse_args()))
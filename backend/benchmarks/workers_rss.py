@@ -0,0 +1,85 @@
+"""
+Memory of the gunicorn process tree vs. worker count, with and without the preloaded model.
+
+    python benchmarks/workers_rss.py --workers 1 2 4
+    python benchmarks/ttfb.py --url http://localhost:8765 ...   # throughput, in another shell, with --hold
+
+Boots `gunicorn -c gunicorn_conf.py` for each worker count and preload setting, waits for every
+worker to warm up, then reads /proc: RSS double-counts pages shared copy-on-write, PSS splits
+them between the processes sharing them, so the PSS total is the tree's real footprint.
+Linux only. Output is one JSON line per run.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def tree(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        children = [int(c) for c in f.read().split()]
+    return [pid] + [p for c in children for p in tree(c)]
+
+def memory_kb(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                fields[parts[0][:-1].lower()] = int(parts[1])
+    return fields
+
+def wait_warm(url, workers, timeout):
+    """Polls /status until `workers` distinct pids have reported every client built."""
+    warm, started = set(), time.perf_counter()
+    with httpx.Client(timeout=5) as client:
+        while len(warm) < workers and time.perf_counter() - started < timeout:
+            try:
+                body = client.get(f"{url}/status").json()
+                if all(body["clients"].values()):
+                    warm.add(body["pid"])
+            except (httpx.TransportError, ValueError, KeyError):
+                time.sleep(0.2)
+    return len(warm)
+
+def run(workers, preload, args):
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PRELOAD_APP": "1" if preload else "0", "PORT": str(args.port)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "api:app", "-c", "gunicorn_conf.py"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        warm = wait_warm(f"http://127.0.0.1:{args.port}", workers, args.timeout)
+        if args.hold:
+            input(f"{workers} workers up on :{args.port}; run the load now, then press Enter...")
+        pids = tree(proc.pid)
+        totals = [memory_kb(p) for p in pids]
+        return {
+            "workers": workers,
+            "preload": preload,
+            "warm_workers": warm,
+            "processes": len(pids),
+            "rss_mb": round(sum(t["rss"] for t in totals) / 1024, 1),
+            "pss_mb": round(sum(t["pss"] for t in totals) / 1024, 1),
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure RSS/PSS of the gunicorn tree per worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--hold", action="store_true", help="Pause with the server up so a load test can run against it.")
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        for preload in (False, True):
+            print(json.dumps(run(workers, preload, args)))
@@ -0,0 +1,239 @@
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+from langchain_core.embeddings import Embeddings
+from redis.exceptions import RedisError
+
+from redisvl.index import AsyncSearchIndex
+from redisvl.query import VectorQuery
+from redisvl.query.filter import Tag
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+# ingest.py bumps this key after every upload, which retires every answer built on the old corpus.
+INDEX_VERSION_KEY = "janus:index_version"
+INDEX_VERSION_REFRESH = float(os.getenv("INDEX_VERSION_REFRESH", "30"))   # Seconds between stamp reads
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))  # Minimum cosine similarity
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+ANSWER_PREFIX = "janus:answer"
+ANSWER_LRU_KEY = "janus:answer_lru"
+
+ANSWER_SCHEMA = {
+    "index": {"name": "janus_answers", "prefix": ANSWER_PREFIX, "storage_type": "hash"},
+    "fields": [
+        {"name": "scope", "type": "tag", "attrs": {"separator": ";"}},
+        {"name": "embedding", "type": "vector", "attrs": {
+            "dims": 384, "distance_metric": "cosine", "algorithm": "flat", "datatype": "float32"
+        }},
+    ],
+}
+
+# --- INDEX VERSION ---
+class IndexVersion:
+    """
+    Per-worker view of the ingest stamp, re-read from Redis at most every INDEX_VERSION_REFRESH seconds.
+    While Redis is unreachable the last known stamp stands, so cache keys never take retrieval down.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.value = "0"
+        self.checked_at = 0.0
+
+    async def get(self) -> str:
+        if time.monotonic() - self.checked_at > INDEX_VERSION_REFRESH:
+            try:
+                stamp = await self.redis.get(INDEX_VERSION_KEY)
+                self.value = stamp.decode() if stamp else "0"
+            except RedisError:
+                pass
+            self.checked_at = time.monotonic()
+        return self.value
+
+# --- SEMANTIC ANSWER CACHE ---
+class SemanticAnswerCache:
+    """
+    Final answers keyed by question embedding, scoped by (index version, regulation year).
+    Lookups are a single KNN-1 query on Redis Stack; entries expire after ANSWER_CACHE_TTL and
+    the least recently hit ones are evicted once the cache holds ANSWER_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self, redis, embed_query, plan_years, index_version: IndexVersion):
+        self.redis = redis
+        self.embed_query = embed_query
+        self.plan_years = plan_years    # The concept index's years, so "DRS" and "Active Aero" scope like retrieval does
+        self.index_version = index_version
+        self.index = AsyncSearchIndex.from_dict(ANSWER_SCHEMA, redis_client=redis)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "seconds_saved": 0.0}
+
+    async def setup(self):
+        if not await self.index.exists():
+            await self.index.create()
+
+    async def scope(self, message: str) -> str:
+        return f"{await self.index_version.get()}|{','.join(map(str, self.plan_years(message)))}"
+
+    async def embed(self, message: str) -> bytes:
+        vector = await self.embed_query(message)
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+    async def lookup(self, scope: str, vector: bytes):
+        """Returns the cached answer dict for the nearest question in scope, or None below the threshold."""
+        query = VectorQuery(
+            vector=vector,
+            vector_field_name="embedding",
+            return_fields=["answer", "question", "gen_seconds"],
+            filter_expression=Tag("scope") == scope,
+            num_results=1,
+        )
+        results = await self.index.query(query)
+        if not results or 1 - float(results[0]["vector_distance"]) < ANSWER_CACHE_THRESHOLD:
+            self.stats["misses"] += 1
+            return None
+
+        hit = results[0]
+        # The TTL restarts with the LRU score, so "not hit within the TTL" is exactly "expired" (see store)
+        await self.redis.zadd(ANSWER_LRU_KEY, {hit["id"]: time.time()})
+        await self.redis.expire(hit["id"], ANSWER_CACHE_TTL)
+        self.stats["hits"] += 1
+        return hit
+
+    def record_saved(self, hit, served_seconds: float):
+        self.stats["seconds_saved"] += max(0.0, float(hit.get("gen_seconds", 0)) - served_seconds)
+
+    async def store(self, scope: str, vector: bytes, question: str, answer: str, gen_seconds: float):
+        key = f"{ANSWER_PREFIX}:{uuid.uuid4().hex}"
+        await self.index.load(
+            [{"scope": scope, "embedding": vector, "question": question, "answer": answer, "gen_seconds": gen_seconds}],
+            keys=[key],
+            ttl=ANSWER_CACHE_TTL,
+        )
+        now = time.time()
+        await self.redis.zadd(ANSWER_LRU_KEY, {key: now})
+        self.stats["stores"] += 1
+
+        # Anything not hit within the TTL has already expired; past the cap, drop the coldest entries.
+        await self.redis.zremrangebyscore(ANSWER_LRU_KEY, 0, now - ANSWER_CACHE_TTL)
+        overflow = await self.redis.zcard(ANSWER_LRU_KEY) - ANSWER_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [member for member, _ in await self.redis.zpopmin(ANSWER_LRU_KEY, overflow)]
+            await self.redis.delete(*evicted)
+            self.stats["evictions"] += len(evicted)
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+# --- RETRIEVAL CACHES ---
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", str(6 * 3600)))
+RETRIEVAL_PREFIX = "janus:retrieval"
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    In-process LRU of query string -> vector in front of the embedding batcher. Document embedding passes
+    straight through. Called from worker threads, hence the lock; cleared when the index version moves.
+    """
+
+    def __init__(self, inner, max_size: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.inner = inner
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def set_version(self, version: str):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+    def embed_query(self, text: str):
+        with self.lock:
+            if text in self.entries:
+                self.entries.move_to_end(text)
+                self.stats["hits"] += 1
+                return self.entries[text]
+            self.stats["misses"] += 1
+
+        vector = self.inner.embed_query(text)
+        with self.lock:
+            self.entries[text] = vector
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts):
+        """Several queries of one retrieval: cached vectors are reused, the misses go through the batcher together."""
+        with self.lock:
+            vectors = {t: self.entries[t] for t in texts if t in self.entries}
+            for t in vectors:
+                self.entries.move_to_end(t)
+            self.stats["hits"] += len(vectors)
+            misses = list(dict.fromkeys(t for t in texts if t not in vectors))
+            self.stats["misses"] += len(misses)
+
+        if misses:
+            fresh = self.inner.embed_queries(misses)
+            with self.lock:
+                for text, vector in zip(misses, fresh):
+                    vectors[text] = self.entries[text] = vector
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return [vectors[t] for t in texts]
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+class RetrievalCache:
+    """
+    Shared (cross-worker) cache of (normalized query, year set, k) -> formatted context string.
+    Keys carry the index version, so a new ingest orphans every entry; TTL sweeps the orphans.
+    Inactive until attach() hands it the Redis pool at startup.
+    """
+
+    def __init__(self):
+        self.redis = None
+        self.index_version = None
+        self.stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    def attach(self, redis, index_version: IndexVersion):
+        self.redis, self.index_version = redis, index_version
+
+    async def version(self) -> str:
+        return await self.index_version.get() if self.index_version else "0"
+
+    async def key(self, query: str, years, k: int) -> str:
+        digest = hashlib.sha1(f"{query}|{','.join(map(str, sorted(years)))}|{k}".encode("utf-8")).hexdigest()
+        return f"{RETRIEVAL_PREFIX}:{await self.version()}:{digest}"
+
+    async def get(self, key: str):
+        if self.redis is None:
+            return None
+        try:
+            value = await self.redis.get(key)
+        except RedisError:
+            self.stats["errors"] += 1
+            return None
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value.decode("utf-8") if value is not None else None
+
+    async def put(self, key: str, context: str):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, context, ex=RETRIEVAL_CACHE_TTL)
+        except RedisError:
+            self.stats["errors"] += 1
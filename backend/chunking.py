@@ -0,0 +1,185 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from langchain_core.documents import Document
+
+from local_index import LOCAL_INDEX_DIR
+
+# --- CONFIGURATION ---
+# Regulations are cut where the FIA cuts them: at article numbers. Small child chunks (one clause,
+# or one whole table) are embedded; the article block they belong to (the parent, e.g. all of C3.4)
+# is stored once in a local SQLite file and is what retrieval hands to the LLM.
+CHILD_CHUNK_CHARS = int(os.getenv("CHILD_CHUNK_CHARS", "600"))
+PARENT_CHUNK_CHARS = int(os.getenv("PARENT_CHUNK_CHARS", "2400"))
+PARENT_STORE_PATH = os.getenv("PARENT_STORE_PATH", os.path.join(LOCAL_INDEX_DIR, "parents.sqlite"))
+PARENT_DEPTH = 2    # C3.4.1 and C3.4.2 share the parent C3.4
+TITLE_CHARS = 120   # Shorter than this, an article is just its heading
+
+# "C3.4.1 Title", "## ARTICLE C3: ...", "**5.14** Overtake": letter-prefixed numbers always start an
+# article; bare dotted numbers only when capitalised text follows, so "1.5 kg of fuel" never does.
+HEADING_PATTERN = re.compile(
+    r"^[ \t#*>_-]*(?:article\s+)?(?:([A-F]\d{1,2}(?:\.\d{1,2}){0,3})|(\d{1,2}(?:\.\d{1,2}){1,3}))\b[.:*)]*\s*(\S?)",
+    re.IGNORECASE,
+)
+SENTENCE_END = re.compile(r"(?<=[.;:])\s+")
+
+def heading_article(line: str):
+    match = HEADING_PATTERN.match(line)
+    if not match:
+        return None
+    lettered, dotted, next_char = match.groups()
+    if lettered:
+        return lettered.upper()
+    return dotted if not next_char or next_char.isupper() or next_char in "*_#(" else None
+
+def parent_article(article: str) -> str:
+    return ".".join(article.split(".")[:PARENT_DEPTH]) if article else ""
+
+def units(text: str):
+    """(article, unit) pairs: a unit is a paragraph or a whole Markdown table, never split further here."""
+    article, lines, in_table = "", [], False
+
+    def flush():
+        if lines and "".join(lines).strip():
+            yield article, "\n".join(lines).strip("\n")
+        lines.clear()
+
+    for line in text.splitlines():
+        if in_table and not line.strip():
+            continue    # A table broken by a page join carries on as the same table
+        is_table = line.lstrip().startswith("|")
+        heading = None if is_table else heading_article(line)
+        if heading or not line.strip() or is_table != in_table:
+            yield from flush()
+        if heading:
+            article = heading
+        in_table = is_table
+        if line.strip():
+            lines.append(line)
+    yield from flush()
+
+def split_paragraph(text: str, limit: int):
+    """An over-long clause, cut at sentence ends (or hard at the limit if one sentence runs longer)."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(text):
+        while len(sentence) > limit:
+            pieces.append(sentence[:limit])
+            sentence = sentence[limit:]
+        if current and len(current) + len(sentence) + 1 > limit:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+def pack(parts, limit: int, size=len):
+    """Greedy packing of whole parts into groups of at most limit chars (a single larger part stays whole)."""
+    packed, current, used = [], [], 0
+    for part in parts:
+        if current and used + size(part) > limit:
+            packed.append(current)
+            current, used = [], 0
+        current.append(part)
+        used += size(part) + 2    # The "\n\n" joining it to the next part
+    if current:
+        packed.append(current)
+    return packed
+
+def block_chars(articles) -> int:
+    return sum(len(u) + 2 for _, article_units in articles for u in article_units)
+
+def parent_key(metadata: dict, text: str) -> str:
+    return hashlib.sha1(f"{metadata.get('source')}\n{text}".encode("utf-8")).hexdigest()
+
+def split_regulation(pages, child_chars: int = CHILD_CHUNK_CHARS, parent_chars: int = PARENT_CHUNK_CHARS):
+    """
+    One source file's pages -> (children, parents). Pages are joined first, so an article running over
+    a page break stays one article. Children carry "article" and "parent_id" on top of the file metadata;
+    parents is {parent_id: Document}.
+    """
+    if not pages:
+        return [], {}
+    metadata = pages[0].metadata
+    text = "\n\n".join(p.page_content for p in pages)
+
+    # Articles in order, each as its units; consecutive articles with one parent number form a block.
+    # A block that is only a title ("ARTICLE C4: MASS") opens the block of its first sub-article instead.
+    blocks = []
+    for article, unit in units(text):
+        key = parent_article(article)
+        block = blocks[-1] if blocks else None
+        if block and (block[0] == key or (article.startswith(f"{block[0]}.") and block_chars(block[1]) < TITLE_CHARS)):
+            block[0] = key
+            if block[1][-1][0] == article:
+                block[1][-1][1].append(unit)
+            else:
+                block[1].append((article, [unit]))
+        else:
+            blocks.append([key, [(article, [unit])]])
+
+    children, parents = [], {}
+    for _, articles in blocks:
+        # A block over the parent budget becomes several parents, cut between articles (or between units)
+        pieces = [(a, group) for a, article_units in articles for group in pack(article_units, parent_chars)]
+        for parent in pack(pieces, parent_chars, size=lambda piece: sum(len(u) + 2 for u in piece[1])):
+            parent_text = "\n\n".join(u for _, article_units in parent for u in article_units)
+            parent_id = parent_key(metadata, parent_text)
+            parents[parent_id] = Document(page_content=parent_text, metadata={**metadata, "article": parent[0][0], "parent_id": parent_id})
+
+            title = ""
+            for article, article_units in parent:
+                if block_chars([(article, article_units)]) < TITLE_CHARS and (article, article_units) != parent[-1]:
+                    title += "\n\n".join(article_units) + "\n"   # Rides on the next article's first child
+                    continue
+                parts = [p for u in article_units for p in ([u] if u.lstrip().startswith("|") else split_paragraph(u, child_chars))]
+                for i, child in enumerate(pack(parts, child_chars)):
+                    child_text = "\n\n".join(child)
+                    if i and article:
+                        child_text = f"{article} (cont.)\n{child_text}"
+                    children.append(Document(page_content=title + child_text, metadata={**metadata, "article": article, "parent_id": parent_id}))
+                    title = ""
+    return children, parents
+
+# --- PARENT STORE ---
+class ParentStore:
+    """
+    parent_id -> article block, in one SQLite file next to the local index. Written whole by ingest.py,
+    read-only at serve time; lookups come from retrieval threads, so the connection is locked.
+    """
+
+    def __init__(self, path: str = PARENT_STORE_PATH):
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def write(parents, path: str = PARENT_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        partial = f"{path}.tmp"
+        if os.path.exists(partial):
+            os.remove(partial)
+        with sqlite3.connect(partial) as connection:
+            connection.execute("CREATE TABLE parents (id TEXT PRIMARY KEY, article TEXT, text TEXT)")
+            connection.executemany(
+                "INSERT INTO parents VALUES (?, ?, ?)",
+                ((pid, doc.metadata.get("article", ""), doc.page_content) for pid, doc in parents.items()),
+            )
+        connection.close()
+        os.replace(partial, path)   # Serving workers never see a half-written store
+
+    def get_many(self, parent_ids):
+        """{parent_id: (article, text)} for the ids that exist."""
+        ids = list(dict.fromkeys(parent_ids))
+        if not ids:
+            return {}
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT id, article, text FROM parents WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {pid: (article, text) for pid, article, text in rows}
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
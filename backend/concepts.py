@@ -0,0 +1,189 @@
+import os
+import re
+from collections import deque
+
+# --- CONFIGURATION ---
+# concepts.txt maps user jargon to FIA terms ("[DRS] = Drag Reduction System (2025), Active Aero (2026)").
+# It is compiled once per worker into an Aho-Corasick automaton, so resolving every alias in a
+# question is one pass over its characters however many aliases the sheet grows to.
+CONCEPTS_PATH = os.getenv("CONCEPTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "concepts.txt"))
+MAX_EXPANSIONS = int(os.getenv("MAX_QUERY_EXPANSIONS", "3"))   # Extra retrieval queries per tool call
+
+DEFAULT_YEAR = 2026
+FIRST_YEAR = 2022
+CONCEPT_LINE = re.compile(r"^\[(.+?)\]\s*=\s*(.+)$")
+TAGGED_ALIAS = re.compile(r"^(.+?)\s*\((.+)\)$")       # "Flat Floor (2026)", "FIS (Front Impact Structure)"
+ARTICLE_REF = re.compile(r"^article\s+([A-F]?\d{1,2}(?:\.\d{1,2}){0,3})$", re.IGNORECASE)
+YEAR_PATTERN = re.compile(r"\b(20[2-3]\d)\b")
+
+class Concept:
+    def __init__(self, term: str, section: str):
+        self.term = term
+        self.section = section
+        self.aliases = {}      # alias -> regulation year it belongs to, or None for every year
+        self.articles = []
+        self.years = []        # Only era concepts ("[Ground Effect Era] = 2022, ...") carry years
+
+    def aliases_for(self, years):
+        """FIA wording for the years being searched: DRS is "Drag Reduction System" in 2025, "Active Aero" in 2026."""
+        return [a for a, year in self.aliases.items() if a != self.term and (year is None or year in years)]
+
+def parse_concepts(lines):
+    concepts, section = [], ""
+    for line in lines:
+        line = line.strip()
+        if line.startswith("#"):
+            section = line.strip("# ")
+            continue
+        match = CONCEPT_LINE.match(line)
+        if not match:
+            continue
+        concept = Concept(match.group(1).strip(), section)
+        concept.aliases[concept.term] = None
+        for item in (i.strip() for i in match.group(2).split(",")):
+            article = ARTICLE_REF.match(item)
+            if article:
+                concept.articles.append(article.group(1).upper())
+            elif YEAR_PATTERN.fullmatch(item):
+                concept.years.append(int(item))
+            elif TAGGED_ALIAS.match(item):
+                name, tag = TAGGED_ALIAS.match(item).groups()
+                if YEAR_PATTERN.fullmatch(tag):
+                    concept.aliases[name] = int(tag)
+                elif "only" in tag.lower():
+                    concept.aliases[name] = None       # "MGU-H (Archive only)": a note, not a synonym
+                else:
+                    concept.aliases[name] = concept.aliases[tag] = None
+            elif item:
+                concept.aliases[item] = None
+        concepts.append(concept)
+    return concepts
+
+# --- AUTOMATON ---
+class AliasAutomaton:
+    """Aho-Corasick over lower-cased aliases; matches only on word boundaries, leftmost-longest first."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, value in patterns:
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.out[node].append((len(pattern), value))
+
+        # Breadth-first failure links; each node inherits the outputs of its longest proper suffix
+        pending = deque(self.goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self.goto[node].items():
+                pending.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text: str):
+        """[(start, end, value)] for every whole-word alias in text, overlaps resolved leftmost-longest."""
+        text = text.lower()
+        hits, node = [], 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, value in self.out[node]:
+                start = end - length
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    hits.append((start, end, value))
+
+        hits.sort(key=lambda h: (h[0], -(h[1] - h[0])))
+        kept, covered = [], 0
+        for start, end, value in hits:
+            if start >= covered or (kept and (start, end) == kept[-1][:2]):
+                kept.append((start, end, value))
+                covered = max(covered, end)
+        return kept
+
+# --- QUERY PLANNING ---
+class QueryPlan:
+    def __init__(self, query: str, years, eras, concepts, expansions):
+        self.query = query
+        self.years = years              # Regulation years the question is about
+        self.eras = eras
+        self.concepts = concepts        # Matched concepts, in order of appearance
+        self.expansions = expansions    # Extra retrieval queries in FIA wording
+
+    def search_years(self):
+        """Each year plus the one before it, for carry-over rules (see search_knowledge_base)."""
+        return sorted({y for year in self.years for y in (year, year - 1) if y >= FIRST_YEAR})
+
+    def header(self) -> str:
+        """One line ahead of the retrieved context, so the agent sees the terms and years already resolved."""
+        terms = ", ".join(
+            f"{c.term} → {', '.join(c.aliases_for(self.years)[:3] + [f'Article {a}' for a in c.articles]) or c.term}" for c in self.concepts
+        )
+        parts = [f"YEARS: {', '.join(map(str, self.years))}"]
+        if self.eras:
+            parts.append(f"ERA: {', '.join(self.eras)}")
+        if terms:
+            parts.append(f"TERMS: {terms}")
+        return "QUERY PLAN: " + " | ".join(parts)
+
+class ConceptIndex:
+    def __init__(self, concepts):
+        self.concepts = concepts
+        self.eras = [c for c in concepts if c.years]
+        self.automaton = AliasAutomaton(
+            (alias.lower(), (concept, alias))
+            for concept in concepts
+            for alias in list(concept.aliases) + [f"article {a}" for a in concept.articles]
+            if not YEAR_PATTERN.fullmatch(alias)
+        )
+
+    @classmethod
+    def load(cls, path: str = CONCEPTS_PATH):
+        if not os.path.exists(path):
+            print(f"⚠️ {path} not found: queries go to retrieval unexpanded.")
+            return cls([])
+        with open(path, encoding="utf-8") as f:
+            return cls(parse_concepts(f))
+
+    def era_of(self, year: int):
+        return next((c.term for c in self.eras if year in c.years), None)
+
+    def plan(self, query: str, target_year: int = None) -> QueryPlan:
+        """
+        Years: target_year if the agent gave one, plus any year the question names. Otherwise the
+        named years, else a named era, else the year of the wording used ("Ground Effect Tunnels"
+        is 2025 language), else 2026.
+        """
+        matched, tagged_years = [], set()
+        for _, _, (concept, alias) in self.automaton.find(query):
+            if concept not in matched:
+                matched.append(concept)
+            if concept.aliases.get(alias):
+                tagged_years.add(concept.aliases[alias])
+
+        named = {int(y) for y in YEAR_PATTERN.findall(query)}
+        era_years = {y for c in matched if c.years for y in c.years}
+        if target_year:
+            years = sorted(named | {target_year})
+        else:
+            years = sorted(named or era_years or tagged_years or {DEFAULT_YEAR})
+
+        expansions = []
+        for concept in (c for c in matched if not c.years):
+            wording = [concept.term] + concept.aliases_for(years) + [f"Article {a}" for a in concept.articles]
+            expansion = " ".join(dict.fromkeys(wording))
+            if expansion.lower() != query.lower() and expansion not in expansions:
+                expansions.append(expansion)
+
+        eras = list(dict.fromkeys(e for e in (self.era_of(y) for y in years) if e))
+        return QueryPlan(query, years, eras, [c for c in matched if not c.years], expansions[:MAX_EXPANSIONS])
@@ -0,0 +1,163 @@
+import os
+import time
+import queue
+import argparse
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+# EMBEDDING_BACKEND=onnx serves queries from a dynamically quantized (int8) ONNX export of MiniLM:
+# a fraction of the torch model's load time and memory, and faster on CPU. The export is produced
+# at Docker build time (`python embedding_model.py --export-onnx`); without it, torch is used.
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/minilm-onnx")
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")   # arm64 | avx2 | avx512 | avx512_vnni
+ONNX_FILE = f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+# Concurrent query embeddings are gathered for up to EMBED_BATCH_WINDOW_MS (or EMBED_MAX_BATCH
+# queries) and run as one forward pass. EMBED_MAX_BATCH=1 embeds each query inline, unbatched.
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "2"))
+WAIT_SAMPLES = 2048   # Recent queue waits kept for the percentiles
+
+def onnx_export_ready(model_dir: str = ONNX_MODEL_DIR) -> bool:
+    return os.path.exists(os.path.join(model_dir, ONNX_FILE))
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """The query-side embedding model. Imported here, not at module level: torch alone costs seconds."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    if backend == "onnx" and onnx_export_ready():
+        return HuggingFaceEmbeddings(
+            model_name=ONNX_MODEL_DIR,
+            model_kwargs={"backend": "onnx", "model_kwargs": {"file_name": ONNX_FILE}},
+        )
+    if backend == "onnx":
+        print(f"⚠️ No ONNX export at {ONNX_MODEL_DIR}/{ONNX_FILE}; falling back to torch.")
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+class EmbeddingBatcher:
+    """
+    Micro-batches query embeddings across concurrent requests. Callers (retrieval threads) block on
+    a future while one scheduler thread drains the queue into batches: once traffic is concurrent,
+    the first query opens a window and everything that arrives within it rides the same forward
+    pass. Queries that arrive while a batch is running form the next one.
+    """
+
+    def __init__(self, load_model, max_batch: int = EMBED_MAX_BATCH, window_ms: float = EMBED_BATCH_WINDOW_MS):
+        self.load_model = load_model
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.queue = queue.Queue()
+        self.scheduler = None
+        self.owner_pid = None
+        self.lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def embed_query(self, text: str):
+        if self.max_batch <= 1:
+            return self.load_model().embed_query(text)
+        self._ensure_scheduler()
+        # Imported here so the Docker pre-bake (`python embedding_model.py`, copied alone) runs standalone
+        from telemetry import span
+        future = Future()
+        with span("embed", "query"):   # Caller's view: queue wait + its share of a forward pass
+            self.queue.put((text, time.perf_counter(), future))
+            return future.result()
+
+    def embed_queries(self, texts):
+        """Several queries of one caller, queued together: they share forward passes with every other chat."""
+        if self.max_batch <= 1:
+            return [self.load_model().embed_query(text) for text in texts]
+        self._ensure_scheduler()
+        from telemetry import span
+        futures = [Future() for _ in texts]
+        with span("embed", "queries"):
+            queued_at = time.perf_counter()
+            for text, future in zip(texts, futures):
+                self.queue.put((text, queued_at, future))
+            return [future.result() for future in futures]
+
+    def embed_documents(self, texts):
+        return self.load_model().embed_documents(texts)
+
+    def _ensure_scheduler(self):
+        # Threads don't survive fork: a worker forked from a preloaded master starts its own
+        if self.owner_pid != os.getpid():
+            with self.lock:
+                if self.owner_pid != os.getpid():
+                    self.scheduler = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self.scheduler.start()
+                    self.owner_pid = os.getpid()
+
+    def _run(self):
+        last_size = 1
+        while True:
+            batch = [self.queue.get()]
+            # A lone user never waits: the window only opens once traffic has produced a real batch
+            deadline = time.perf_counter() + (self.window if last_size > 1 else 0)
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+            last_size = len(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            from telemetry import span
+            # embed_documents on HuggingFaceEmbeddings is embed_query over a list: same vectors
+            with span("embed", "batch"):
+                vectors = self.load_model().embed_documents([text for text, _, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.batch_sizes[len(batch)] += 1
+        for (_, queued_at, future), vector in zip(batch, vectors):
+            self.waits.append(started - queued_at)
+            future.set_result(vector)
+
+    def snapshot(self):
+        batches = sum(self.batch_sizes.values())
+        embedded = sum(size * count for size, count in self.batch_sizes.items())
+        waits = sorted(self.waits)
+        def wait_ms(pct):
+            return round(waits[min(len(waits) - 1, int(pct / 100 * len(waits)))] * 1000, 2) if waits else 0.0
+        return {
+            "max_batch": self.max_batch,
+            "window_ms": self.window * 1000,
+            "batches": batches,
+            "embedded": embedded,
+            "mean_batch": round(embedded / batches, 2) if batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "queue_wait_ms": {"p50": wait_ms(50), "p99": wait_ms(99), "max": wait_ms(100)},
+        }
+
+def export_onnx(model_dir: str = ONNX_MODEL_DIR):
+    """ONNX export of MiniLM plus its int8 dynamically quantized variant, written under model_dir."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(EMBEDDING_MODEL, backend="onnx")
+    model.save(model_dir)
+    export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, model_dir)
+    print(f"✅ Quantized ONNX model written to {os.path.join(model_dir, ONNX_FILE)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare the MiniLM query embedding model.")
+    parser.add_argument("--export-onnx", action="store_true", help="Write the int8 ONNX export to ONNX_MODEL_DIR.")
+    args = parser.parse_args()
+
+    if args.export_onnx:
+        export_onnx()
+    else:
+        # Pre-download the torch weights into the image cache
+        load_embedding_model("torch")
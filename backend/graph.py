@@ -1,17 +1,27 @@
 import os
-import operator
-from typing import Annotated, TypedDict, List
+import time
+import asyncio
+import threading
+from typing import Annotated, Optional, TypedDict, List
 from dotenv import load_dotenv
 
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
 from langgraph.checkpoint.redis.aio import AsyncRedisSaver
-from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.messages import (
+    BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage, message_chunk_to_message, trim_messages
+)
+from langchain_core.documents import Document
 from langchain_core.tools import tool
-from langchain_deepseek import ChatDeepSeek 
-from langchain_pinecone import PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.tools import DuckDuckGoSearchRun
 from pydantic import BaseModel, Field
+from local_index import LOCAL_INDEX_DIR, LocalVectorIndex
+from lexical import LEXICAL_INDEX_PATH, LexicalIndex, hybrid_search
+from singleflight import SingleFlight, normalize_query
+from cache import CachedQueryEmbeddings, RetrievalCache
+from concepts import ConceptIndex
+from chunking import PARENT_STORE_PATH, ParentStore
+from embedding_model import EmbeddingBatcher, load_embedding_model
+from telemetry import current_trace, observe, span, timed_node
 
 load_dotenv()
 
@@ -19,99 +29,334 @@ load_dotenv()
 if os.getenv("MUNIN"):
     os.environ["PINECONE_API_KEY"] = os.getenv("MUNIN")
 
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vectorstore = PineconeVectorStore(index_name="f1-regulations-all", embedding=embeddings)
-ddg = DuckDuckGoSearchRun()
+# VECTOR_BACKEND=local searches the memory-mapped export from `python ingest.py --target local`
+# instead of Pinecone: no network hop per retrieval, and it runs fully offline.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+
+class Lazy:
+    """
+    A heavy client built on first use instead of at import, so the server binds its port in
+    seconds. Tool calls run in worker threads, so construction is locked and happens exactly once.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.value = None
+        self.ready = False
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        if not self.ready:
+            with self.lock:
+                if not self.ready:
+                    self.value = self.factory()
+                    self.ready = True
+        return self.value
+
+    @property
+    def missing(self):
+        """Built, but its factory found nothing to load (an index file ingest.py never wrote)."""
+        return self.ready and self.value is None
+
+def load_vectorstore():
+    if VECTOR_BACKEND == "local":
+        return LocalVectorIndex(LOCAL_INDEX_DIR, embeddings)
+    from langchain_pinecone import PineconeVectorStore
+    return PineconeVectorStore(index_name="f1-regulations-all", embedding=embeddings)
+
+def load_lexical_index():
+    # Lexical half of hybrid retrieval (BM25 + article table, built by ingest.py). Without it: dense only.
+    return LexicalIndex.load(LEXICAL_INDEX_PATH) if os.path.exists(LEXICAL_INDEX_PATH) else None
+
+def load_parent_store():
+    # Article blocks behind the indexed child chunks (built by ingest.py). Without it: children as retrieved.
+    return ParentStore(PARENT_STORE_PATH) if os.path.exists(PARENT_STORE_PATH) else None
+
+def load_ddg():
+    from langchain_community.tools import DuckDuckGoSearchRun
+    return DuckDuckGoSearchRun()
+
+# Repeated questions skip MiniLM: query vectors are memoised per worker (see cache.CachedQueryEmbeddings).
+# Misses from concurrent chats share forward passes through the batcher.
+embedding_model = Lazy(load_embedding_model)
+embedding_batcher = EmbeddingBatcher(embedding_model)
+embeddings = CachedQueryEmbeddings(embedding_batcher)
+vectorstore = Lazy(load_vectorstore)
+lexical_index = Lazy(load_lexical_index)
+parent_store = Lazy(load_parent_store)
+ddg = Lazy(load_ddg)
+# Jargon -> FIA wording and years, compiled from concepts.txt (see concepts.py)
+concept_index = Lazy(ConceptIndex.load)
 
 # --- STATE & MODELS ---
+# add_messages (instead of operator.add) lets the compact node replace or remove stored messages by ID
 class AgentState(TypedDict):
-    messages: Annotated[List[BaseMessage], operator.add]
+    messages: Annotated[List[BaseMessage], add_messages]
 
 class SearchInput(BaseModel):
     query: str = Field(description="The technical term to search for.")
-    target_year: int = Field(default=2026, description="Specific year to prioritize.")
+    target_year: Optional[int] = Field(default=None, description="Specific year to prioritize. Omit it to infer the year from the query (default 2026).")
 
 # --- TOOLS ---
-@tool("search_knowledge_base", args_schema=SearchInput)
-def search_knowledge_base(query: str, target_year: int = 2026):
-    """Accesses FIA F1 Regulations with Batch-Retrieval and Priority-Gated Fallback."""
-    try:
-        # STRATEGY: One request for current + previous year to eliminate loop latency
-        search_years = [target_year, target_year - 1] if target_year > 2022 else [target_year]
-        
-        results = vectorstore.similarity_search(
-            query, 
-            k=8, 
-            filter={"year": {"$in": search_years}}
+RETRIEVAL_K = 8                                                     # Child chunks matched per search
+CONTEXT_BUDGET_CHARS = int(os.getenv("CONTEXT_BUDGET_CHARS", "4800"))  # Regulation text per tool result
+
+def expand_parents(results):
+    """
+    Matched children -> their article blocks, each block once, in rank order. Once the budget is
+    spent, a further hit keeps its child text instead of pulling in a whole block.
+    """
+    store = parent_store()
+    blocks = store.get_many(d.metadata.get("parent_id") for d in results) if store else {}
+    expanded, seen, used = [], set(), 0
+    for doc in results:
+        parent_id = doc.metadata.get("parent_id")
+        if parent_id in seen:
+            continue
+        block = blocks.get(parent_id)
+        if block and used + len(block[1]) <= CONTEXT_BUDGET_CHARS:
+            seen.add(parent_id)
+            doc = Document(page_content=block[1], metadata={**doc.metadata, "article": block[0]})
+        elif used + len(doc.page_content) > CONTEXT_BUDGET_CHARS and expanded:
+            continue
+        expanded.append(doc)
+        used += len(doc.page_content)
+    return expanded
+
+def retrieve_context(query: str, search_years: List[int], expansions: List[str] = ()) -> str:
+    with span("retrieval", VECTOR_BACKEND):
+        results = hybrid_search(
+            vectorstore(), lexical_index(), query, search_years, k=RETRIEVAL_K,
+            expansions=expansions, embed_queries=embeddings.embed_queries,
         )
-        
-        if not results:
-            return "No relevant regulations found."
+    
+    if not results:
+        return "No relevant regulations found."
+    results = expand_parents(results)
 
-        # Sort: Priority 1 (Final) first
-        results.sort(key=lambda x: x.metadata.get('priority', 2))
-        has_finalized = any(doc.metadata.get('priority') == 1 for doc in results)
+    # Sort: Priority 1 (Final) first
+    results.sort(key=lambda x: x.metadata.get('priority', 2))
+    has_finalized = any(doc.metadata.get('priority') == 1 for doc in results)
+    
+    context = []
+    for doc in results:
+        p_val = doc.metadata.get('priority', 2)
+        if p_val == 1:
+            status = "[[✅ OFFICIAL FINALIZED REGULATION]]"
+        else:
+            status = "[[⚠️ OBSOLETE DRAFT]]" if has_finalized else "[[ℹ️ PROVISIONAL DRAFT]]"
+
+        article = f" | ARTICLE: {doc.metadata['article']}" if doc.metadata.get("article") else ""
+        context.append(
+            f"SOURCE: {doc.metadata.get('source')} | YEAR: {doc.metadata.get('year')}{article} | STATUS: {status}\n"
+            f"CONTENT: {doc.page_content}\n"
+        )
         
-        context = []
-        for doc in results:
-            p_val = doc.metadata.get('priority', 2)
-            if p_val == 1:
-                status = "[[✅ OFFICIAL FINALIZED REGULATION]]"
-            else:
-                status = "[[⚠️ OBSOLETE DRAFT]]" if has_finalized else "[[ℹ️ PROVISIONAL DRAFT]]"
-
-            context.append(
-                f"SOURCE: {doc.metadata.get('source')} | YEAR: {doc.metadata.get('year')} | STATUS: {status}\n"
-                f"CONTENT: {doc.page_content}\n"
-            )
-            
-        return "\n---\n".join(context)
+    return "\n---\n".join(context)
+
+# Seconds a single tool call may take before the turn carries on without it
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+TOOL_TIMEOUTS = {
+    "search_knowledge_base": float(os.getenv("KB_TOOL_TIMEOUT", str(DEFAULT_TOOL_TIMEOUT))),
+    "search_web": float(os.getenv("WEB_TOOL_TIMEOUT", "15")),
+}
+
+# Identical questions in flight at the same time (same normalized query + year) share one upstream call.
+# A follower waits on another worker's leader for half its tool timeout, leaving the rest for its own call.
+kb_flight = SingleFlight("kb", follow_timeout=TOOL_TIMEOUTS["search_knowledge_base"] / 2)
+web_flight = SingleFlight("web", follow_timeout=TOOL_TIMEOUTS["search_web"] / 2)
+# Formatted contexts shared across workers; api.lifespan attaches Redis, until then every lookup misses
+retrieval_cache = RetrievalCache()
+
+async def cached_retrieve_context(query: str, search_years: List[int], expansions: List[str] = ()) -> str:
+    # Expansions follow from the query and years (and concepts.txt, which ships with the code)
+    key = await retrieval_cache.key(normalize_query(query), search_years, RETRIEVAL_K)
+    with span("cache", "retrieval_get"):
+        context = await retrieval_cache.get(key)
+    if context is None:
+        embeddings.set_version(await retrieval_cache.version())
+        context = await asyncio.to_thread(retrieve_context, query, search_years, expansions)
+        await retrieval_cache.put(key, context)
+    return context
+
+@tool("search_knowledge_base", args_schema=SearchInput)
+async def search_knowledge_base(query: str, target_year: Optional[int] = None):
+    """Accesses FIA F1 Regulations with Batch-Retrieval and Priority-Gated Fallback. Jargon, eras and years in the query are resolved to FIA terms here; one call covers every year the query names."""
+    try:
+        # STRATEGY: jargon, era and years are resolved here, not in another agent round trip; every
+        # year is searched with the one before it, and the FIA wording rides along as extra queries.
+        with span("retrieval", "plan"):
+            plan = concept_index().plan(query, target_year)
+        search_years = plan.search_years()
+        context = await kb_flight.do(
+            f"{normalize_query(query)}|{','.join(map(str, search_years))}",
+            lambda: cached_retrieve_context(query, search_years, plan.expansions),
+        )
+        return f"{plan.header()}\n\n{context}"
     except Exception as e:
         return f"Telemetry Failure: Vector search failed. {str(e)}"
 
+def run_web_search(query: str) -> str:
+    with span("web", "duckduckgo"):
+        return ddg().invoke(f"{query} F1 2026")
+
 @tool("search_web")
-def search_web(query: str):
+async def search_web(query: str):
     """MANDATORY for live news, drivers, and team standings."""
     try:
-        return ddg.invoke(f"{query} F1 2026")
-    except:
+        return await web_flight.do(normalize_query(query), lambda: asyncio.to_thread(run_web_search, query))
+    except Exception:
         return "Search uplink offline. Rely on internal technical specs."
 
 tools = [search_knowledge_base, search_web]
+TOOLS_BY_NAME = {t.name: t for t in tools}
+
+# --- HISTORY MANAGEMENT ---
+SYSTEM_PROMPT = SystemMessage(content="""
+    You are **Janus 2.0**, the F1 Technical Director.
+    1. DEFAULT TO 2026: Prioritize new regs.
+    2. STRICT ISOLATION: Do not mix years unless comparing.
+    3. VISUALS: Use Markdown tables.
+    4. CITE: Use [Source: Filename | Year: 20XX].
+""")
+
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "12000"))   # Per LLM call, system prompt included
+MAX_STORED_TURNS = int(os.getenv("MAX_STORED_TURNS", "20"))        # Turns kept in the Redis checkpoint
+TOOL_DIGEST_CHARS = int(os.getenv("TOOL_DIGEST_CHARS", "400"))     # Size of a finished turn's tool output
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """~4 characters per token plus per-message framing; close enough for budgeting, and free."""
+    total = 0
+    for m in messages:
+        total += 4 + len(str(m.content)) // 4
+        for call in getattr(m, "tool_calls", None) or []:
+            total += len(str(call.get("args", ""))) // 4
+    return total
+
+def current_turn_start(messages: List[BaseMessage]) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return i
+    return 0
+
+def digest_tool_output(content: str) -> str:
+    """Keeps what an old retrieval consulted (the SOURCE headers), drops the regulation text itself."""
+    if len(content) <= TOOL_DIGEST_CHARS:
+        return content
+    headers = [line for line in content.splitlines() if line.startswith("SOURCE:")]
+    digest = "\n".join(headers) if headers else content[:TOOL_DIGEST_CHARS]
+    return f"[Earlier tool output compacted]\n{digest[:TOOL_DIGEST_CHARS]}"
+
+def build_prompt(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    What DeepSeek actually sees: one system prompt, the current turn in full, and as much earlier
+    history as fits the token budget, with earlier tool dumps reduced to their digests.
+    """
+    history = [m for m in messages if not isinstance(m, SystemMessage)]
+    start = current_turn_start(history)
+    past, current = history[:start], history[start:]
+
+    past = [
+        m.model_copy(update={"content": digest_tool_output(str(m.content))}) if isinstance(m, ToolMessage) else m
+        for m in past
+    ]
+    budget = MAX_PROMPT_TOKENS - estimate_tokens([SYSTEM_PROMPT] + current)
+    past = trim_messages(past, max_tokens=max(budget, 0), token_counter=estimate_tokens, strategy="last", start_on="human") if past else []
+    return [SYSTEM_PROMPT] + past + current
 
 # --- NODES ---
-llm = ChatDeepSeek(model="deepseek-chat", temperature=0, api_key=os.getenv("HUGIN"), max_retries=2)
-llm_with_tools = llm.bind_tools(tools)
+def load_llm():
+    from langchain_deepseek import ChatDeepSeek
+    llm = ChatDeepSeek(model="deepseek-chat", temperature=0, api_key=os.getenv("HUGIN"), max_retries=2)
+    return llm.bind_tools(tools)
 
-def agent_node(state: AgentState):
-    return {"messages": [llm_with_tools.invoke(state['messages'])]}
+llm_with_tools = Lazy(load_llm)
+HEAVY_CLIENTS = {
+    "embeddings": embedding_model, "vectorstore": vectorstore, "lexical_index": lexical_index,
+    "parent_store": parent_store, "web_search": ddg, "llm": llm_with_tools, "concepts": concept_index,
+}
 
-def tool_node(state: AgentState):
-    messages = state['messages']
-    last_message = messages[-1]
-    outputs = []
-    for tool_call in last_message.tool_calls:
-        selected_tool = next((t for t in tools if t.name == tool_call["name"]), None)
-        if selected_tool:
+def warm_up():
+    """Builds every heavy client and runs one embedding, so the first user doesn't pay for either."""
+    for client in HEAVY_CLIENTS.values():
+        client()
+    embedding_model().embed_query("warm up")
+
+async def agent_node(state: AgentState):
+    # Stream the completion so the "messages" stream mode can forward tokens the moment DeepSeek emits them.
+    response = None
+    started = time.perf_counter()
+    async for chunk in llm_with_tools().astream(build_prompt(state['messages'])):
+        if response is None:
+            observe("llm", "first_token", time.perf_counter() - started)
+        response = chunk if response is None else response + chunk
+    return {"messages": [message_chunk_to_message(response)]}
+
+async def run_tool_call(tool_call) -> ToolMessage:
+    """One tool call -> one ToolMessage, always: failures and timeouts become error text for the agent."""
+    name = tool_call["name"]
+    selected_tool = TOOLS_BY_NAME.get(name)
+    trace = current_trace.get()
+    if trace:
+        trace.tool_calls += 1
+    with span("tool", name) as record:
+        if selected_tool is None:
+            content = f"Error: unknown tool '{name}'."
+            record["error"] = "unknown_tool"
+        else:
+            timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
             try:
-                res = selected_tool.invoke(tool_call["args"])
-                outputs.append(ToolMessage(content=str(res), name=tool_call["name"], tool_call_id=tool_call["id"]))
+                content = str(await asyncio.wait_for(selected_tool.ainvoke(tool_call["args"]), timeout=timeout))
+            except asyncio.TimeoutError:
+                content = f"Error: {name} timed out after {timeout:.0f}s."
+                record["error"] = "timeout"
             except Exception as e:
-                outputs.append(ToolMessage(content=f"Error: {str(e)}", name=tool_call["name"], tool_call_id=tool_call["id"]))
-    return {"messages": outputs}
+                content = f"Error: {str(e)}"
+                record["error"] = type(e).__name__
+    return ToolMessage(content=content, name=name, tool_call_id=tool_call["id"])
+
+async def tool_node(state: AgentState):
+    # Every call of the turn runs concurrently, so the turn costs the slowest tool, not the sum.
+    # gather keeps the original order; run_tool_call never raises, so one failure can't sink the rest.
+    last_message = state['messages'][-1]
+    outputs = await asyncio.gather(*(run_tool_call(t) for t in last_message.tool_calls))
+    return {"messages": list(outputs)}
+
+def compact_node(state: AgentState):
+    """
+    Runs once per finished turn so the Redis checkpoint stays bounded: stored system prompts
+    (older threads saved one per turn) are removed, tool dumps become digests, and only the
+    last MAX_STORED_TURNS turns are kept.
+    """
+    messages = state['messages']
+    human_indexes = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    keep_from = human_indexes[-MAX_STORED_TURNS] if len(human_indexes) > MAX_STORED_TURNS else 0
+
+    updates = []
+    for i, m in enumerate(messages):
+        if i < keep_from or isinstance(m, SystemMessage):
+            updates.append(RemoveMessage(id=m.id))
+        elif isinstance(m, ToolMessage):
+            digest = digest_tool_output(str(m.content))
+            if digest != m.content:
+                updates.append(m.model_copy(update={"content": digest}))
+    return {"messages": updates}
 
 def router_function(state: AgentState):
     """Named router for production observability."""
     last_message = state['messages'][-1]
-    return "tools" if last_message.tool_calls else END
+    return "tools" if last_message.tool_calls else "compact"
 
 # --- COMPILE ---
 workflow = StateGraph(AgentState)
-workflow.add_node("agent", agent_node)
-workflow.add_node("tools", tool_node)
+# Each node run is a span in janus_stage_seconds{stage="node"} (see telemetry.py)
+workflow.add_node("agent", timed_node("agent", agent_node))
+workflow.add_node("tools", timed_node("tools", tool_node))
+workflow.add_node("compact", timed_node("compact", compact_node))
 workflow.set_entry_point("agent")
-workflow.add_conditional_edges("agent", router_function, {"tools": "tools", END: END})
+workflow.add_conditional_edges("agent", router_function, {"tools": "tools", "compact": "compact"})
 workflow.add_edge("tools", "agent")
+workflow.add_edge("compact", END)
 
 # REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 # memory = AsyncRedisSaver(REDIS_URL) 
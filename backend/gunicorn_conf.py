@@ -0,0 +1,51 @@
+import gc
+import os
+import shutil
+
+# Workers write their metrics to files here and /metrics sums them (prometheus_client multiprocess
+# mode). Must be set before the app is imported, and start empty so a restart doesn't inherit counts.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/janus-metrics")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+from embedding_model import EMBEDDING_BACKEND
+
+# --- SERVING ---
+# gunicorn forks WEB_CONCURRENCY uvicorn workers from one master that has already imported the app
+# and loaded MiniLM. Model weights are shared copy-on-write, so each extra worker costs its own
+# Redis pool and event loop, not another copy of torch and the model.
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4))))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+keepalive = 5
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+# On SIGTERM (deploys, scale-down) workers stop accepting connections and let open /chat streams
+# finish; anything still streaming after STREAM_DRAIN_TIMEOUT seconds is cut off.
+graceful_timeout = int(os.getenv("STREAM_DRAIN_TIMEOUT", "60"))
+
+# Torch threads per worker, so N workers don't each spin up one thread per core
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", str(max(1, (os.cpu_count() or 1) // workers))))
+
+def when_ready(server):
+    # Runs in the master after preload_app, before the first fork. ONNX Runtime sessions own
+    # thread pools that do not survive fork, so the ONNX model is left to load in each worker.
+    if preload_app and EMBEDDING_BACKEND == "torch":
+        import graph
+        graph.embedding_model()
+        server.log.info("MiniLM preloaded in master; workers share it copy-on-write.")
+    # Everything allocated so far moves out of the collector's reach: a GC pass in a worker
+    # would otherwise write to every object header and un-share the pages.
+    gc.freeze()
+
+def post_fork(server, worker):
+    try:
+        import torch
+        torch.set_num_threads(EMBED_THREADS)
+    except ImportError:
+        pass
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
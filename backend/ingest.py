@@ -162,16 +162,26 @@
 # print("DONE. The Brain can now read tables natively and remembers the past.")
 
 import os
+import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import nest_asyncio
+import numpy as np
+import redis
 import requests
 from dotenv import load_dotenv
 from llama_parse import LlamaParse
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
+from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone, ServerlessSpec
 from langchain_core.documents import Document
+from cache import INDEX_VERSION_KEY
+from local_index import LOCAL_INDEX_DIR, export_local_index
+from lexical import LEXICAL_INDEX_PATH, LexicalIndex, chunk_key
+from chunking import CHILD_CHUNK_CHARS, PARENT_CHUNK_CHARS, PARENT_STORE_PATH, ParentStore, split_regulation
 
 # Fix for asyncio loop issues in scripts
 nest_asyncio.apply()
@@ -185,6 +195,26 @@ PINECONE_KEY = os.getenv("MUNIN")
 LLAMA_KEY = os.getenv("LLAMA_CLOUD_API_KEY") 
 INDEX_NAME = "f1-regulations-all"
 
+# --- INCREMENTAL STATE ---
+# manifest.json records, per source file, the content hash last synced to Pinecone and the chunk IDs
+# it owns there. parsed/ and vectors/ cache LlamaParse output and chunk embeddings by content hash,
+# so an unchanged file is never parsed or embedded twice and a crashed run resumes where it stopped.
+INGEST_DIR = os.getenv("INGEST_STATE_DIR", ".ingest")
+MANIFEST_PATH = os.path.join(INGEST_DIR, "manifest.json")
+CHEAT_SHEET = "concepts.txt"
+# Tags cached vectors and manifest entries: a new value re-embeds and re-syncs every file. It follows the
+# chunk sizes (env-overridable in chunking.py); bump the "articles" tag itself when the chunking code changes.
+CHUNKER_VERSION = f"articles-{CHILD_CHUNK_CHARS}-{PARENT_CHUNK_CHARS}"
+DELETE_BATCH = 1000
+
+# --- PIPELINE TUNING (all overridable from the CLI) ---
+DOWNLOAD_WORKERS = 4
+PARSE_WORKERS = 4
+EMBED_PROCESSES = os.cpu_count() or 1
+EMBED_BATCH = 512          # Chunks gathered across files before one encode call
+UPSERT_BATCH = 200         # Vectors per Pinecone request (text metadata keeps requests well under 2 MB)
+UPSERT_WORKERS = 4
+
 # --- THE MANIFEST OF TRUTH ---
 # These specific files are tagged Priority 1 (Finalized Authority).
 # All other files in your library are kept as Priority 2 (Supplemental Context).
@@ -199,21 +229,6 @@ FINALIZED_MANIFEST = {
     "2022_regs.pdf" # Finalized Issue 11
 }
 
-# --- 2. SETUP PINECONE ---
-pc = Pinecone(api_key=PINECONE_KEY)
-if INDEX_NAME in [i.name for i in pc.list_indexes()]:
-    print(f" Clearing old index '{INDEX_NAME}'...")
-    pc.delete_index(INDEX_NAME)
-
-print(f" Creating new index '{INDEX_NAME}'...")
-pc.create_index(
-    name=INDEX_NAME,
-    dimension=384,
-    metric="cosine",
-    spec=ServerlessSpec(cloud="aws", region="us-east-1")
-)
-
-# --- 3. DOWNLOAD SOURCES ---
 pdf_urls = {
     "2026_regs_tech_iss15.pdf": "https://www.fia.com/system/files/documents/fia_2026_f1_regulations_-_section_c_technical_-_iss_15_-_2025-12-10.pdf",
     "2026_regs_sport_iss04.pdf": "https://www.fia.com/system/files/documents/fia_2026_f1_regulations_-_section_b_sporting_-_iss_04_-_2025-12-10.pdf",
@@ -227,73 +242,431 @@ pdf_urls = {
     "2022_regs.pdf": "https://api.fia.com/sites/default/files/formula_1_-_technical_regulations_-_2022_-_iss_11_-_2022-04-29.pdf"
 }
 
-for name, url in pdf_urls.items():
-    if not os.path.exists(name):
-        print(f" Downloading {name}...")
-        r = requests.get(url, timeout=30)
-        with open(name, 'wb') as f:
-            f.write(r.content)
+# --- MANIFEST ---
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {"files": {}}
+
+def save_manifest(manifest):
+    # Write-then-rename: a crash mid-write never leaves a truncated manifest behind
+    os.makedirs(INGEST_DIR, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def cache_path(kind, key, ext):
+    os.makedirs(os.path.join(INGEST_DIR, kind), exist_ok=True)
+    return os.path.join(INGEST_DIR, kind, f"{key}.{ext}")
+
+# --- 2. SETUP PINECONE ---
+def open_pinecone_index(rebuild=False, manifest=None):
+    pc = Pinecone(api_key=PINECONE_KEY)
+    exists = INDEX_NAME in [i.name for i in pc.list_indexes()]
+    if exists and not rebuild and not (manifest or {}).get("files"):
+        # Without a manifest we don't know which vectors in the index are ours: an index built before
+        # incremental ingest holds random-UUID IDs, and syncing on top would duplicate every chunk.
+        raise SystemExit(
+            f" Index '{INDEX_NAME}' exists but {MANIFEST_PATH} is missing or empty. "
+            "Run once with --rebuild to re-create it under content-hash IDs."
+        )
+    if exists and rebuild:
+        print(f" Clearing old index '{INDEX_NAME}'...")
+        pc.delete_index(INDEX_NAME)
+        exists = False
+
+    if not exists:
+        print(f" Creating new index '{INDEX_NAME}'...")
+        pc.create_index(
+            name=INDEX_NAME,
+            dimension=384,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    return pc.Index(INDEX_NAME)
+
+# --- PROGRESS ---
+class StageMeter:
+    """Thread-safe progress + throughput line for one pipeline stage."""
+
+    def __init__(self, stage, unit):
+        self.stage, self.unit = stage, unit
+        self.count, self.busy = 0, 0.0
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, n, seconds, note=""):
+        with self.lock:
+            self.count += n
+            self.busy += seconds
+            elapsed = time.perf_counter() - self.started
+            print(f" [{self.stage}] {self.count} {self.unit} ({self.count / max(elapsed, 1e-9):.1f}/s) {note}".rstrip())
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return f"{self.stage}: {self.count} {self.unit}, {self.busy:.1f}s busy, {self.count / max(elapsed, 1e-9):.1f} {self.unit}/s"
+
+# --- 3. DOWNLOAD SOURCES ---
+def download_file(name, url, session):
+    r = session.get(url, timeout=30)
+    r.raise_for_status()
+    with open(name, 'wb') as f:
+        f.write(r.content)
+    return name
+
+def download_sources(workers=DOWNLOAD_WORKERS):
+    missing = {name: url for name, url in pdf_urls.items() if not os.path.exists(name)}
+    meter = StageMeter("download", "files")
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(download_file, name, url, session): (name, time.perf_counter()) for name, url in missing.items()}
+        for future in as_completed(futures):
+            name, submitted = futures[future]
+            future.result()
+            meter.add(1, time.perf_counter() - submitted, name)
+    return meter
+
+def source_files():
+    sources = [name for name in pdf_urls if os.path.exists(name)]
+    if os.path.exists(CHEAT_SHEET):
+        sources.append(CHEAT_SHEET)
+    return sources
 
 # --- 4. PARSE WITH LLAMAPARSE ---
-print(" Parsing PDFs with LlamaParse (Preserving Article Hierarchy)...")
-parser = LlamaParse(
-    result_type="markdown", 
-    api_key=LLAMA_KEY,
-    num_workers=4,
-    parsing_instruction="This is an F1 Technical/Sporting Regulation. Extract all tables precisely in Markdown. Preserve every Article number (e.g., C3.4.1) at the start of its paragraph. Do not omit technical units (kg, mm, kW)."
-)
-
-all_docs = []
-
-for filename in pdf_urls.keys():
-    if os.path.exists(filename):
-        print(f" Reading and Tagging: {filename}...")
-        parsed_docs = parser.load_data(filename)
-        
-        doc_year = int(filename.split("_")[0])
-        
-        # 1. SECTION TAGGING
-        if "tech" in filename: section = "Technical" 
-        elif "sport" in filename: section = "Sporting"
-        elif "operational" in filename: section = "Operational"
-        elif "general" in filename: section = "General"
-        else: section = "Technical"
-
-        # 2. PRIORITY LOGIC (The Manifest check)
-        priority = 1 if filename in FINALIZED_MANIFEST else 2
-
-        for doc in parsed_docs:
-            lc_doc = Document(
-                page_content=doc.text,
-                metadata={
-                    "source": filename,
-                    "year": doc_year,      
-                    "section": section,    
-                    "priority": priority,  
-                    "era": "Nimble Car" if doc_year >= 2026 else "Ground Effect"
-                }
+# Parser and embedding model are only built when some file actually needs them,
+# so a run with nothing new never pays for the model load.
+_parser = None
+_parser_lock = threading.Lock()
+
+def get_parser():
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            _parser = LlamaParse(
+                result_type="markdown", 
+                api_key=LLAMA_KEY,
+                num_workers=4,
+                parsing_instruction="This is an F1 Technical/Sporting Regulation. Extract all tables precisely in Markdown. Preserve every Article number (e.g., C3.4.1) at the start of its paragraph. Do not omit technical units (kg, mm, kW)."
             )
-            all_docs.append(lc_doc)
-
-# Handle Cheat Sheet
-if os.path.exists("concepts.txt"):
-    loader = TextLoader("concepts.txt")
-    cheat_docs = loader.load()
-    for d in cheat_docs: 
-        d.metadata.update({"year": 0, "source": "CheatSheet", "priority": 1})
-    all_docs.extend(cheat_docs)
-
-# --- 5. CHUNK & UPLOAD ---
-print(f" Splitting {len(all_docs)} pages into chunks...")
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-chunks = splitter.split_documents(all_docs)
-
-print(f" Uploading {len(chunks)} chunks to Pinecone...")
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-vectorstore = PineconeVectorStore.from_documents(
-    documents=chunks,
-    embedding=embeddings,
-    index_name=INDEX_NAME
-)
-
-print("DONE. Janus 2.0 Knowledge Base is now authoritative.")
\ No newline at end of file
+    return _parser
+
+def tag_metadata(filename):
+    if filename == CHEAT_SHEET:
+        return {"year": 0, "source": "CheatSheet", "priority": 1}
+
+    doc_year = int(filename.split("_")[0])
+    
+    # 1. SECTION TAGGING
+    if "tech" in filename: section = "Technical" 
+    elif "sport" in filename: section = "Sporting"
+    elif "operational" in filename: section = "Operational"
+    elif "general" in filename: section = "General"
+    else: section = "Technical"
+
+    # 2. PRIORITY LOGIC (The Manifest check)
+    priority = 1 if filename in FINALIZED_MANIFEST else 2
+
+    return {
+        "source": filename,
+        "year": doc_year,      
+        "section": section,    
+        "priority": priority,  
+        "era": "Nimble Car" if doc_year >= 2026 else "Ground Effect"
+    }
+
+def parse_source(filename, sha):
+    """Page texts for one file; LlamaParse only runs for content it has never seen."""
+    path = cache_path("parsed", sha, "json")
+    if os.path.exists(path):
+        with open(path) as f:
+            pages = json.load(f)
+    else:
+        print(f" Reading and Tagging: {filename}...")
+        if filename == CHEAT_SHEET:
+            with open(filename, encoding="utf-8") as f:
+                pages = [f.read()]
+        else:
+            pages = [doc.text for doc in get_parser().load_data(filename)]
+        with open(path, "w") as f:
+            json.dump(pages, f)
+
+    metadata = tag_metadata(filename)
+    return [Document(page_content=text, metadata=dict(metadata)) for text in pages]
+
+# --- 5. CHUNK, EMBED & SYNC ---
+def chunk_source(pages):
+    """
+    Article-aware children (embedded) and their parent article blocks (see chunking.py).
+    Chunks carry a content-hash ID; identical chunks inside one file collapse into one.
+    """
+    children, parents = split_regulation(pages)
+    chunks = {}
+    for chunk in children:
+        chunk.metadata["chunk_id"] = chunk_key(chunk)
+        chunks.setdefault(chunk.metadata["chunk_id"], chunk)
+    return list(chunks.values()), parents
+
+def vector_cache_path(sha, chunks):
+    # The chunk IDs hash the chunk texts, so vectors are only ever reused for exactly these chunks
+    chunk_digest = hashlib.sha1("\n".join(c.metadata["chunk_id"] for c in chunks).encode("utf-8")).hexdigest()[:16]
+    return cache_path("vectors", f"{sha}-{CHUNKER_VERSION}-{chunk_digest}", "npy")
+
+def cached_vectors(sha, chunks):
+    """Chunk vectors for one file from a previous run (keyed by content hash, chunker version and chunk IDs), if any."""
+    path = vector_cache_path(sha, chunks)
+    if os.path.exists(path):
+        vectors = np.load(path)
+        if len(vectors) == len(chunks):
+            return vectors
+    return None
+
+class BatchEmbedder:
+    """
+    MiniLM encoder for large cross-file batches. With processes > 1 the batch is sharded over a
+    sentence-transformers worker pool, one process per core; the pool is started once and reused.
+    """
+
+    def __init__(self, processes=EMBED_PROCESSES, batch_size=64):
+        self.processes, self.batch_size = processes, batch_size
+        self.model, self.pool = None, None
+
+    def embed(self, texts):
+        if self.model is None:
+            self.model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+            if self.processes > 1:
+                self.pool = self.model.start_multi_process_pool(["cpu"] * self.processes)
+        if self.pool is not None:
+            vectors = self.model.encode_multi_process(texts, self.pool, batch_size=self.batch_size)
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+def sync_pinecone(index, filename, chunks, vectors, manifest, sha, upsert_batch=UPSERT_BATCH, upsert_workers=UPSERT_WORKERS):
+    """Upserts the chunk IDs Pinecone lacks and deletes the ones this file no longer produces."""
+    entry = manifest["files"].get(filename, {})
+    # Only IDs a finished sync confirmed count as present. IDs a crashed run left pending may or may not
+    # have reached Pinecone: they are upserted again (upserts are idempotent) and deleted if now stale.
+    # After a chunker change even a chunk with an unchanged ID may carry a new parent_id, so all are re-upserted
+    synced = set(entry.get("chunks", [])) if entry.get("chunker") == CHUNKER_VERSION else set()
+    known = set(entry.get("chunks", [])) | set(entry.get("pending", []))
+    current = [c.metadata["chunk_id"] for c in chunks]
+
+    entry["pending"] = list(dict.fromkeys(entry.get("pending", []) + current))
+    manifest["files"][filename] = entry
+    save_manifest(manifest)
+
+    fresh = [(c, v) for c, v in zip(chunks, vectors) if c.metadata["chunk_id"] not in synced]
+    batches = [
+        [{"id": c.metadata["chunk_id"], "values": v.tolist(), "metadata": {**c.metadata, "text": c.page_content}}
+         for c, v in fresh[start:start + upsert_batch]]
+        for start in range(0, len(fresh), upsert_batch)
+    ]
+    with ThreadPoolExecutor(max_workers=upsert_workers) as pool:
+        for _ in pool.map(lambda batch: index.upsert(vectors=batch, show_progress=False), batches):
+            pass
+
+    stale = sorted(known - set(current))
+    for start in range(0, len(stale), DELETE_BATCH):
+        index.delete(ids=stale[start:start + DELETE_BATCH])
+
+    manifest["files"][filename] = {
+        "sha256": sha,
+        "parsed": cache_path("parsed", sha, "json"),
+        "chunker": CHUNKER_VERSION,
+        "chunks": current,
+    }
+    save_manifest(manifest)
+    print(f" Synced {filename}: +{len(fresh)} chunks, -{len(stale)} chunks.")
+    return bool(fresh or stale)
+
+def drop_removed_sources(index, manifest, sources):
+    changed = False
+    for filename in [f for f in manifest["files"] if f not in sources]:
+        ids = manifest["files"][filename].get("chunks", []) + manifest["files"][filename].get("pending", [])
+        for start in range(0, len(ids), DELETE_BATCH):
+            index.delete(ids=ids[start:start + DELETE_BATCH])
+        del manifest["files"][filename]
+        save_manifest(manifest)
+        print(f" Removed {filename}: -{len(ids)} chunks.")
+        changed = True
+    return changed
+
+def build_lexical(chunks, path):
+    # BM25 postings + article-number table for hybrid retrieval; used with either vector backend
+    lexical = LexicalIndex.build(chunks)
+    lexical.save(path)
+    print(f" Lexical index written to '{path}' ({len(lexical.postings)} terms, {len(lexical.articles)} articles).")
+
+def build_parent_store(parents, path):
+    # Parent article blocks for retrieval to return in place of the children it matched; any vector backend
+    ParentStore.write(parents, path)
+    print(f" Parent store written to '{path}' ({len(parents)} article blocks).")
+
+def export_local(chunks, vectors, out_dir, dtype):
+    export_local_index(chunks, vectors, out_dir, dtype)
+    print(f" Local index written to '{out_dir}/' ({len(chunks)} chunks, {dtype}; serve it with VECTOR_BACKEND=local).")
+
+# --- PIPELINE ---
+def run_pipeline(sources, manifest, index, opts):
+    """
+    parse (thread pool) -> chunk -> embed (cross-file batches, multi-process) -> upsert (background thread).
+    Parsed files stream into the embedder as they finish, and the Pinecone upserts of one batch overlap
+    with encoding the next. Returns every chunk and vector in source order, the parent blocks, and whether Pinecone changed.
+    """
+    parse_meter = StageMeter("parse", "files")
+    embed_meter = StageMeter("embed", "chunks")
+    upsert_meter = StageMeter("upsert", "files")
+    embedder = BatchEmbedder(opts.embed_processes)
+    results, parents, changed = {}, {}, []
+
+    # Bounded queue: if Pinecone falls behind, embedding waits instead of buffering the corpus in RAM
+    upsert_q = queue.Queue(maxsize=2)
+    upsert_errors = []
+
+    def uploader():
+        while (item := upsert_q.get()) is not None:
+            filename, sha, chunks, vectors = item
+            try:
+                started = time.perf_counter()
+                changed.append(sync_pinecone(index, filename, chunks, vectors, manifest, sha, opts.upsert_batch, opts.upsert_workers))
+                upsert_meter.add(1, time.perf_counter() - started, filename)
+            except Exception as e:
+                upsert_errors.append(e)
+
+    upload_thread = threading.Thread(target=uploader, daemon=True)
+    if index is not None:
+        upload_thread.start()
+
+    def finish(filename, sha, chunks, vectors):
+        results[filename] = (chunks, vectors)
+        if index is None:
+            return
+        # A new chunker changes the chunk IDs of an unchanged file, so it has to be re-synced too
+        entry = manifest["files"].get(filename, {})
+        if entry.get("sha256") == sha and entry.get("chunker") == CHUNKER_VERSION:
+            print(f" Unchanged: {filename}")
+        else:
+            upsert_q.put((filename, sha, chunks, vectors))
+
+    pending, pending_chunks = [], 0
+
+    def flush():
+        nonlocal pending, pending_chunks
+        if not pending:
+            return
+        started = time.perf_counter()
+        vectors = embedder.embed([c.page_content for _, _, chunks in pending for c in chunks])
+        embed_meter.add(len(vectors), time.perf_counter() - started, f"batch of {len(pending)} files")
+        offset = 0
+        for filename, sha, chunks in pending:
+            file_vectors = vectors[offset:offset + len(chunks)]
+            offset += len(chunks)
+            np.save(vector_cache_path(sha, chunks), file_vectors)
+            finish(filename, sha, chunks, file_vectors)
+        pending, pending_chunks = [], 0
+
+    def parse(filename):
+        started = time.perf_counter()
+        sha = file_sha256(filename)
+        return filename, sha, parse_source(filename, sha), time.perf_counter() - started
+
+    try:
+        with ThreadPoolExecutor(max_workers=opts.parse_workers) as pool:
+            for future in as_completed([pool.submit(parse, name) for name in sources]):
+                filename, sha, pages, seconds = future.result()
+                parse_meter.add(1, seconds, filename)
+                chunks, file_parents = chunk_source(pages)
+                parents.update(file_parents)
+                vectors = cached_vectors(sha, chunks)
+                if vectors is not None:
+                    finish(filename, sha, chunks, vectors)
+                    continue
+                pending.append((filename, sha, chunks))
+                pending_chunks += len(chunks)
+                if pending_chunks >= opts.embed_batch:
+                    flush()
+            flush()
+    finally:
+        embedder.close()
+        if index is not None:
+            upsert_q.put(None)
+            upload_thread.join()
+
+    if upsert_errors:
+        raise upsert_errors[0]
+    for meter in (parse_meter, embed_meter, upsert_meter):
+        print(f" {meter.summary()}")
+
+    ordered = [results[name] for name in sources]
+    all_chunks = [c for chunks, _ in ordered for c in chunks]
+    all_vectors = np.concatenate([v for _, v in ordered]) if ordered else np.zeros((0, 384), dtype=np.float32)
+    return all_chunks, all_vectors, parents, any(changed)
+
+# --- 6. STAMP INDEX VERSION ---
+def stamp_index_version():
+    # A new stamp retires every cached answer that was built on the previous corpus (see cache.py).
+    REDIS_URL = os.getenv("REDIS_URL")
+    if REDIS_URL:
+        index_version = time.strftime("%Y%m%d%H%M%S")
+        redis.Redis.from_url(REDIS_URL).set(INDEX_VERSION_KEY, index_version)
+        print(f" Index version stamped: {index_version}")
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description="Build the Janus knowledge base (incrementally by default).")
+    cli.add_argument("--target", choices=["pinecone", "local", "both"], default="pinecone",
+                     help="pinecone: sync the hosted index. local: export a memory-mapped index for VECTOR_BACKEND=local.")
+    cli.add_argument("--rebuild", action="store_true", help="Drop the Pinecone index and re-upload every chunk.")
+    cli.add_argument("--local-dir", default=LOCAL_INDEX_DIR)
+    cli.add_argument("--local-dtype", choices=["float32", "int8"], default="float32")
+    cli.add_argument("--lexical-path", default=LEXICAL_INDEX_PATH)
+    cli.add_argument("--parent-store", default=PARENT_STORE_PATH)
+    cli.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS)
+    cli.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    cli.add_argument("--embed-processes", type=int, default=EMBED_PROCESSES)
+    cli.add_argument("--embed-batch", type=int, default=EMBED_BATCH)
+    cli.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH)
+    cli.add_argument("--upsert-workers", type=int, default=UPSERT_WORKERS)
+    args = cli.parse_args()
+
+    started = time.perf_counter()
+    use_pinecone = args.target in ("pinecone", "both")
+    manifest = load_manifest()
+    index = None
+    if use_pinecone:
+        if not PINECONE_KEY:
+            raise ValueError(" MISSING MUNIN (Pinecone Key) in .env file!")
+        index = open_pinecone_index(rebuild=args.rebuild, manifest=manifest)
+        if args.rebuild:
+            manifest = {"files": {}}
+            save_manifest(manifest)
+
+    print(f" {download_sources(args.download_workers).summary()}")
+    sources = source_files()
+    all_chunks, all_vectors, all_parents, changed = run_pipeline(sources, manifest, index, args)
+
+    if use_pinecone:
+        changed |= drop_removed_sources(index, manifest, sources)
+
+    # The lexical index, parent store and local index are whole-corpus files, rebuilt from the caches in a few seconds
+    build_lexical(all_chunks, args.lexical_path)
+    build_parent_store(all_parents, args.parent_store)
+    if args.target in ("local", "both"):
+        export_local(all_chunks, all_vectors, args.local_dir, args.local_dtype)
+        changed = True
+
+    if changed or args.rebuild:
+        stamp_index_version()
+    print(f"DONE in {time.perf_counter() - started:.1f}s. Janus 2.0 Knowledge Base is now authoritative.")
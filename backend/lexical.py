@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import math
+import hashlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.documents import Document
+
+from local_index import LOCAL_INDEX_DIR
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join(LOCAL_INDEX_DIR, "lexical.json"))
+
+# Keeps dotted article numbers ("c3.4.1", "5.14") together as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z]?\d+(?:\.\d+)+|[a-z0-9]+")
+# An article reference in a question: "C4.1", "Article 5.14", "article C3.5"
+ARTICLE_QUERY_PATTERN = re.compile(r"\b(?:article\s+)?([A-F]?\d{1,2}(?:\.\d{1,2}){0,3})\b", re.IGNORECASE)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+def chunk_key(doc: Document) -> str:
+    """Stable identity for a chunk, shared by the dense and lexical sides of a fusion."""
+    return hashlib.sha1(f"{doc.metadata.get('source')}\n{doc.page_content}".encode("utf-8")).hexdigest()
+
+def article_ids_in(query: str):
+    """Article numbers the user asked for; bare numbers ("1.5 kg", "F1") only count behind "Article"."""
+    ids = []
+    for match in ARTICLE_QUERY_PATTERN.finditer(query):
+        text, article = match.group(0), match.group(1).upper()
+        if text.lower().startswith("article") or (article[0].isalpha() and "." in article):
+            ids.append(article)
+    return ids
+
+def reciprocal_rank_fusion(*rankings, k: int = RRF_K):
+    """Merges ranked Document lists by sum(1 / (k + rank)); documents are matched by chunk_key."""
+    scores, docs = defaultdict(float), {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = chunk_key(doc)
+            scores[key] += 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the ingested chunks plus an exact article-number -> chunk table, taken from
+    the "article" each child chunk carries (see chunking.py). Built by ingest.py, loaded once per worker;
+    a query touches only the postings of its own terms.
+    """
+
+    def __init__(self, docs, postings, articles):
+        self.docs = docs
+        self.year = np.array([int(d.metadata.get("year", 0)) for d in docs], dtype=np.int16)
+        self.articles = articles
+
+        lengths = np.array([len(tokenize(d.page_content)) for d in docs], dtype=np.float32)
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()) if len(docs) else 1.0, 1.0))
+        self.postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for term, (ids, tfs) in postings.items()
+        }
+        self.idf = {
+            term: math.log(1 + (len(docs) - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in self.postings.items()
+        }
+
+    @classmethod
+    def build(cls, chunks):
+        postings = defaultdict(lambda: ([], []))
+        articles = defaultdict(list)
+        for i, doc in enumerate(chunks):
+            for term, tf in Counter(tokenize(doc.page_content)).items():
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+            if doc.metadata.get("article"):
+                articles[doc.metadata["article"]].append(i)
+        return cls(list(chunks), dict(postings), dict(articles))
+
+    def save(self, path: str = LEXICAL_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "docs": [{"text": d.page_content, "metadata": d.metadata} for d in self.docs],
+                "postings": {t: [ids.tolist(), tfs.astype(int).tolist()] for t, (ids, tfs) in self.postings.items()},
+                "articles": self.articles,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_PATH):
+        with open(path) as f:
+            raw = json.load(f)
+        docs = [Document(page_content=d["text"], metadata=d["metadata"]) for d in raw["docs"]]
+        return cls(docs, raw["postings"], raw["articles"])
+
+    def _allowed(self, years):
+        return None if years is None else np.isin(self.year, list(years))
+
+    def search(self, query: str, k: int = 8, years=None):
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tfs = self.postings[term]
+            scores[ids] += self.idf[term] * tfs * (BM25_K1 + 1) / (tfs + self.norm[ids])
+
+        allowed = self._allowed(years)
+        if allowed is not None:
+            scores[~allowed] = 0
+        candidates = np.flatnonzero(scores)
+        top = candidates[np.argsort(-scores[candidates])][:k]
+        return [self.docs[i] for i in top]
+
+    def lookup_articles(self, article_ids, k: int = 8, years=None, sub_articles: bool = False):
+        """Chunks of exactly these articles; with sub_articles, their sub-articles too (C4.1 -> C4.1.2), in file order."""
+        allowed = self._allowed(years)
+        hits = []
+        for article in article_ids:
+            rows = list(self.articles.get(article, []))
+            if sub_articles:
+                rows += [i for key, ids in self.articles.items() if key.startswith(article + ".") for i in ids]
+            hits.extend(i for i in rows if (allowed is None or allowed[i]) and i not in hits)
+        return [self.docs[i] for i in hits[:k]]
+
+def dense_rankings(vectorstore, queries, k: int, year_filter, embed_queries=None):
+    """
+    One ranking per query. With several queries, their vectors come from one embedding pass; the
+    local index scores them all in one matrix product, Pinecone gets the lookups concurrently.
+    """
+    if len(queries) == 1 or embed_queries is None or not hasattr(vectorstore, "similarity_search_by_vector"):
+        return [vectorstore.similarity_search(q, k=k, filter=year_filter) for q in queries]
+    vectors = embed_queries(queries)
+    if hasattr(vectorstore, "similarity_search_by_vectors"):
+        return vectorstore.similarity_search_by_vectors(vectors, k=k, filter=year_filter)
+    with ThreadPoolExecutor(max_workers=len(vectors)) as pool:
+        return list(pool.map(lambda v: vectorstore.similarity_search_by_vector(v, k=k, filter=year_filter), vectors))
+
+def hybrid_search(vectorstore, lexical_index, query: str, search_years, k: int = 8, expansions=(), embed_queries=None):
+    """
+    Explicit dotted article numbers with chunks of their own resolve from the local article table; everything
+    else fuses dense + BM25 with RRF, chapters ("Article 5") adding their sub-articles as one more ranking.
+    expansions (the question in FIA wording, see concepts.py) add one dense ranking each, widen the BM25
+    query, and contribute the articles they name as one more ranking.
+    """
+    year_filter = {"year": {"$in": list(search_years)}}
+    queries = [query, *expansions]
+    if lexical_index is None:
+        rankings = dense_rankings(vectorstore, queries, k, year_filter, embed_queries)
+        return rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(*rankings)[:k]
+
+    lexical = lexical_index.search(" ".join(queries), k=k, years=search_years)
+    articles = article_ids_in(query)
+    # Only specific articles ("5.14", not all of "Article 5") are narrow enough to rank on their own
+    specific = [a for a in articles if "." in a]
+    hits = lexical_index.lookup_articles(specific, k=k, years=search_years) if specific else []
+    if hits:
+        # No embedding and no vector DB round trip: the article chunks lead, BM25 fills the rest
+        seen = {chunk_key(d) for d in hits}
+        return (hits + [d for d in lexical if chunk_key(d) not in seen])[:k]
+
+    # Chapters, articles known only through their sub-articles, and the articles the expansions name
+    named = articles + [a for e in expansions for a in article_ids_in(e) if "." in a]
+    article_hits = lexical_index.lookup_articles(named, k=k, years=search_years, sub_articles=True) if named else []
+    return reciprocal_rank_fusion(*dense_rankings(vectorstore, queries, k, year_filter, embed_queries), lexical, article_hits)[:k]
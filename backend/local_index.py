@@ -0,0 +1,163 @@
+import os
+import json
+import numpy as np
+from langchain_core.documents import Document
+
+# --- ON-DISK LAYOUT ---
+# vectors.bin  : row-major (count, dims) matrix, float32 or int8, memory-mapped at load time
+# scales.npy   : per-row dequantisation scale (int8 only)
+# columns.npz  : metadata columns (year, priority, source/section/era/parent codes, text offsets)
+# text.bin     : every chunk's UTF-8 text back to back, sliced by the offsets column
+# index.json   : shape, dtype and the string tables the code columns point into
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+
+def _encode(values, dtype=np.int16):
+    """String column -> (integer codes, lookup table)."""
+    table = sorted({str(v) for v in values})
+    lookup = {v: i for i, v in enumerate(table)}
+    return np.array([lookup[str(v)] for v in values], dtype=dtype), table
+
+def export_local_index(chunks, vectors, out_dir: str = LOCAL_INDEX_DIR, dtype: str = "float32"):
+    """Writes chunk vectors + metadata in the layout LocalVectorIndex memory-maps."""
+    os.makedirs(out_dir, exist_ok=True)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    # Unit rows turn cosine similarity into a plain dot product at query time
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        np.round(matrix / scales[:, None]).astype(np.int8).tofile(os.path.join(out_dir, "vectors.bin"))
+        np.save(os.path.join(out_dir, "scales.npy"), scales.astype(np.float32))
+    else:
+        matrix.tofile(os.path.join(out_dir, "vectors.bin"))
+
+    texts = [c.page_content.encode("utf-8") for c in chunks]
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    with open(os.path.join(out_dir, "text.bin"), "wb") as f:
+        for t in texts:
+            f.write(t)
+
+    sources, source_table = _encode([c.metadata.get("source", "") for c in chunks])
+    sections, section_table = _encode([c.metadata.get("section", "") for c in chunks])
+    eras, era_table = _encode([c.metadata.get("era", "") for c in chunks])
+    # Parent article blocks live in the parent store (see chunking.py); chunks only carry their ID
+    parents, parent_table = _encode([c.metadata.get("parent_id", "") for c in chunks], dtype=np.int32)
+    np.savez(
+        os.path.join(out_dir, "columns.npz"),
+        year=np.array([int(c.metadata.get("year", 0)) for c in chunks], dtype=np.int16),
+        priority=np.array([int(c.metadata.get("priority", 2)) for c in chunks], dtype=np.int8),
+        source=sources,
+        section=sections,
+        era=eras,
+        parent=parents,
+        offsets=offsets,
+    )
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump({
+            "count": int(matrix.shape[0]),
+            "dims": int(matrix.shape[1]),
+            "dtype": dtype,
+            "source": source_table,
+            "section": section_table,
+            "era": era_table,
+            "parent": parent_table,
+        }, f)
+
+class LocalVectorIndex:
+    """
+    In-process stand-in for PineconeVectorStore.similarity_search: one memory-mapped matrix,
+    a vectorised dot product and argpartition top-k. Year/priority filters are boolean masks
+    precomputed at load time, so filtering costs one OR over a handful of arrays.
+    """
+
+    def __init__(self, path: str, embedding):
+        self.embedding = embedding
+        with open(os.path.join(path, "index.json")) as f:
+            self.info = json.load(f)
+
+        shape = (self.info["count"], self.info["dims"])
+        self.dtype = self.info["dtype"]
+        self.vectors = np.memmap(os.path.join(path, "vectors.bin"), dtype=np.int8 if self.dtype == "int8" else np.float32, mode="r", shape=shape)
+        self.scales = np.load(os.path.join(path, "scales.npy")) if self.dtype == "int8" else None
+
+        columns = np.load(os.path.join(path, "columns.npz"))
+        self.year = columns["year"]
+        self.priority = columns["priority"]
+        self.source = columns["source"]
+        self.section = columns["section"]
+        self.era = columns["era"]
+        self.parent = columns["parent"] if "parent" in columns else None   # Indexes built before parent chunks
+        self.offsets = columns["offsets"]
+        self.text = np.memmap(os.path.join(path, "text.bin"), dtype=np.uint8, mode="r") if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+
+        self.year_masks = {int(y): self.year == y for y in np.unique(self.year)}
+        self.priority_masks = {int(p): self.priority == p for p in np.unique(self.priority)}
+
+    def __len__(self):
+        return self.info["count"]
+
+    def _mask(self, filter):
+        """Translates the Pinecone-style filter used by the tools ({"year": {"$in": [...]}}) into a row mask."""
+        mask = None
+        for field, masks in (("year", self.year_masks), ("priority", self.priority_masks)):
+            condition = (filter or {}).get(field)
+            if condition is None:
+                continue
+            wanted = condition.get("$in", []) if isinstance(condition, dict) else [condition]
+            field_mask = np.zeros(len(self), dtype=bool)
+            for value in wanted:
+                if int(value) in masks:
+                    field_mask |= masks[int(value)]
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def _document(self, row: int) -> Document:
+        raw = self.text[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+        metadata = {
+            "source": self.info["source"][self.source[row]],
+            "year": int(self.year[row]),
+            "section": self.info["section"][self.section[row]],
+            "priority": int(self.priority[row]),
+            "era": self.info["era"][self.era[row]],
+        }
+        if self.parent is not None and self.info["parent"][self.parent[row]]:
+            metadata["parent_id"] = self.info["parent"][self.parent[row]]
+        return Document(page_content=raw, metadata=metadata)
+
+    def _top_k(self, scores, k: int, mask):
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._document(int(i)), float(scores[i])) for i in top]
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, filter=None):
+        return self.similarity_search_by_vectors_with_score([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_by_vectors_with_score(self, embeddings, k: int = 4, filter=None):
+        """Several queries, one pass over the matrix: a (count, dims) @ (dims, n) product instead of n scans."""
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = self.vectors @ queries.T
+        if self.scales is not None:
+            scores = scores * self.scales[:, None]
+        mask = self._mask(filter)
+        return [self._top_k(scores[:, i], k, mask) for i in range(len(queries))]
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4, filter=None):
+        return [[doc for doc, _ in hits] for hits in self.similarity_search_by_vectors_with_score(embeddings, k=k, filter=filter)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter=None):
+        return self.similarity_search_by_vectors([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter=None):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
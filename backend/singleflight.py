@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import uuid
+import asyncio
+from redis.exceptions import RedisError
+
+# --- CONFIGURATION ---
+# Cross-worker coalescing rides on the shared Redis pool: SET NX elects one leader per key,
+# and a single pattern subscription per worker fans the leader's result out to local waiters.
+SINGLEFLIGHT_REDIS = os.getenv("SINGLEFLIGHT_REDIS", "0") == "1"
+SINGLEFLIGHT_PREFIX = "janus:sf"
+LOCK_TTL_MS = int(os.getenv("SINGLEFLIGHT_LOCK_TTL_MS", "30000"))      # Upper bound on one upstream call
+RESULT_TTL_MS = int(os.getenv("SINGLEFLIGHT_RESULT_TTL_MS", "5000"))   # Grace window for late followers
+# Default wait on another worker's leader; callers with a deadline pass their own (see graph.py), short
+# enough that a follower whose leader died still has time to make the call itself
+FOLLOW_TIMEOUT = float(os.getenv("SINGLEFLIGHT_FOLLOW_TIMEOUT", "7.5"))
+# Deletes the lock only while it is still ours: after LOCK_TTL_MS another worker may hold it
+RELEASE_LOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+def normalize_query(query: str) -> str:
+    """'  What is the MINIMUM mass? ' and 'what is the minimum mass' coalesce into one call."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s.]", " ", query.lower())).strip(" .")
+
+class RedisFlightBus:
+    """One pub/sub connection per worker, resolving local futures when any worker publishes a result."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.waiters = {}
+        self.pubsub = None
+        self.listener = None
+
+    async def start(self):
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.psubscribe(f"{SINGLEFLIGHT_PREFIX}:done:*")
+        self.listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.listener:
+            self.listener.cancel()
+        if self.pubsub:
+            await self.pubsub.aclose()
+
+    async def _listen(self):
+        async for message in self.pubsub.listen():
+            if message.get("type") != "pmessage":
+                continue
+            channel = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+            key = channel[len(f"{SINGLEFLIGHT_PREFIX}:done:"):]
+            for future in self.waiters.pop(key, []):
+                if not future.done():
+                    future.set_result(json.loads(message["data"]))
+
+    def wait(self, key):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(key, []).append(future)
+        return future
+
+    def forget(self, key, future):
+        waiters = self.waiters.get(key, [])
+        if future in waiters:
+            waiters.remove(future)
+        if not waiters:
+            self.waiters.pop(key, None)
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one upstream call and all receive its result.
+    The shared call runs as its own task, so a caller that disconnects does not cancel it for the others;
+    once every caller has gone, the call is cancelled instead of running on for nobody.
+    With a RedisFlightBus attached, followers in other workers wait for the leader's result too.
+    """
+
+    def __init__(self, name: str, follow_timeout: float = FOLLOW_TIMEOUT):
+        self.name = name
+        self.follow_timeout = follow_timeout
+        self.inflight = {}
+        self.callers = {}
+        self.bus = None
+        self.worker_id = uuid.uuid4().hex
+        self.stats = {"leaders": 0, "followers": 0, "remote_followers": 0, "fallbacks": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn):
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats["followers"] += 1
+        else:
+            task = asyncio.ensure_future(self._lead(key, fn))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._settle(key, t))
+        self.callers[task] = self.callers.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.callers.get(task) == 1 and not task.done():
+                self.stats["abandoned"] += 1
+                task.cancel()
+            raise
+        finally:
+            self.callers[task] = self.callers.get(task, 1) - 1
+            if not self.callers[task]:
+                del self.callers[task]
+
+    def _settle(self, key, task):
+        self.inflight.pop(key, None)
+        # Mark the error as seen even if every caller went away before it arrived
+        if not task.cancelled():
+            task.exception()
+
+    async def _lead(self, key, fn):
+        if self.bus is None:
+            self.stats["leaders"] += 1
+            return await fn()
+
+        redis_key = f"{self.name}:{key}"
+        lock_key = f"{SINGLEFLIGHT_PREFIX}:lock:{redis_key}"
+        result_key = f"{SINGLEFLIGHT_PREFIX}:result:{redis_key}"
+        channel = f"{SINGLEFLIGHT_PREFIX}:done:{redis_key}"
+
+        try:
+            acquired = await self.bus.redis.set(lock_key, self.worker_id, nx=True, px=LOCK_TTL_MS)
+        except RedisError:
+            # Coordination is an optimisation; with Redis unreachable every worker just asks upstream
+            self.stats["fallbacks"] += 1
+            return await fn()
+
+        if not acquired:
+            # Another worker is already asking upstream: subscribe first, then check for a finished result
+            future = self.bus.wait(redis_key)
+            try:
+                finished = await self.bus.redis.get(result_key)
+                outcome = json.loads(finished) if finished else await asyncio.wait_for(future, self.follow_timeout)
+            except (asyncio.TimeoutError, RedisError):
+                outcome = {"ok": False}
+            finally:
+                self.bus.forget(redis_key, future)
+            if outcome.get("ok"):
+                self.stats["remote_followers"] += 1
+                return outcome["value"]
+            # The leader failed or vanished: make the call ourselves rather than fail the user
+            self.stats["fallbacks"] += 1
+            return await fn()
+
+        self.stats["leaders"] += 1
+        outcome = {"ok": False}
+        try:
+            value = await fn()
+            outcome = {"ok": True, "value": value}
+            return value
+        finally:
+            payload = json.dumps(outcome)
+            try:
+                if outcome["ok"]:
+                    await self.bus.redis.set(result_key, payload, px=RESULT_TTL_MS)
+                await self.bus.redis.publish(channel, payload)
+                await self.bus.redis.eval(RELEASE_LOCK, 1, lock_key, self.worker_id)
+            except RedisError:
+                pass  # Followers time out and fall back to their own call
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import uuid
+import inspect
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+)
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+# Every span lands in a Prometheus histogram (served on /metrics). TRACE_JSON=1 also prints each
+# span as one JSON line tagged with its request ID, for log search. Under gunicorn, workers write
+# to PROMETHEUS_MULTIPROC_DIR (see gunicorn_conf.py) and /metrics aggregates all of them.
+TRACE_JSON = os.getenv("TRACE_JSON", "0") == "1"
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+
+STAGE_SECONDS = Histogram(
+    "janus_stage_seconds", "Time spent per stage of a /chat request.", ["stage", "name"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter("janus_stage_errors_total", "Failed spans and logged failures.", ["stage", "name"])
+REQUESTS = Counter("janus_chat_requests_total", "/chat requests by outcome.", ["outcome"])
+FIRST_BYTE_SECONDS = Histogram("janus_chat_first_byte_seconds", "Time to the first streamed byte.", buckets=STAGE_BUCKETS)
+REQUEST_SECONDS = Histogram("janus_chat_seconds", "Time to the last streamed byte.", buckets=STAGE_BUCKETS)
+AGENT_LOOPS = Histogram("janus_agent_loops", "agent node runs per turn (1 + tool round trips).", buckets=(1, 2, 3, 4, 5, 6, 8, 10))
+TOOL_CALLS = Histogram("janus_tool_calls", "Tool calls per turn.", buckets=(0, 1, 2, 3, 4, 6, 8, 12))
+
+# --- REQUEST CONTEXT ---
+class RequestTrace:
+    """Per-request counters. Graph tasks copy the context, so they all share this one object."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.outcome = "ok"
+        self.write_seconds = 0.0   # Summed into the request line rather than one JSON span per token
+        self.agent_loops = 0
+        self.tool_calls = 0
+
+current_trace: ContextVar[RequestTrace] = ContextVar("current_trace", default=None)
+
+def start_trace(request_id: str = None) -> RequestTrace:
+    trace = RequestTrace(request_id or uuid.uuid4().hex[:12])
+    current_trace.set(trace)
+    return trace
+
+def request_id() -> str:
+    trace = current_trace.get()
+    return trace.request_id if trace else "-"
+
+# --- SPANS ---
+def emit(record: dict):
+    print(json.dumps({"ts": round(time.time(), 3), "request_id": request_id(), **record}), flush=True)
+
+@contextmanager
+def span(stage: str, name: str):
+    """Times a block into janus_stage_seconds{stage,name}. Set record["error"] to flag a handled failure."""
+    record = {"stage": stage, "name": name}
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage, name).observe(elapsed)
+        if "error" in record:
+            STAGE_ERRORS.labels(stage, name).inc()
+        if TRACE_JSON:
+            emit({**record, "ms": round(elapsed * 1000, 3)})
+
+def observe(stage: str, name: str, seconds: float, emit_json: bool = True):
+    """For durations that don't fit a with-block, e.g. time to the first streamed token."""
+    STAGE_SECONDS.labels(stage, name).observe(seconds)
+    if TRACE_JSON and emit_json:
+        emit({"stage": stage, "name": name, "ms": round(seconds * 1000, 3)})
+
+def timed_node(name: str, fn):
+    """Wraps a graph node so each run is a span (and agent runs count as loop iterations)."""
+    def count():
+        trace = current_trace.get()
+        if trace and name == "agent":
+            trace.agent_loops += 1
+
+    if inspect.iscoroutinefunction(fn):
+        async def node(state):
+            count()
+            with span("node", name):
+                return await fn(state)
+    else:
+        def node(state):
+            count()
+            with span("node", name):
+                return fn(state)
+    node.__name__ = fn.__name__
+    return node
+
+def instrument_checkpointer(saver, methods=("aget_tuple", "aput", "aput_writes")):
+    """Times the checkpointer's Redis round trips in place; the saver keeps its own class and type."""
+    def timed(method_name, method):
+        async def call(*args, **kwargs):
+            with span("checkpoint", method_name):
+                return await method(*args, **kwargs)
+        return call
+
+    for method_name in methods:
+        setattr(saver, method_name, timed(method_name, getattr(saver, method_name)))
+    return saver
+
+def finish_trace(trace: RequestTrace, first_byte: float, total: float):
+    REQUESTS.labels(trace.outcome).inc()
+    if first_byte is not None:
+        FIRST_BYTE_SECONDS.observe(first_byte)
+    REQUEST_SECONDS.observe(total)
+    AGENT_LOOPS.observe(trace.agent_loops)
+    TOOL_CALLS.observe(trace.tool_calls)
+    if TRACE_JSON:
+        emit({
+            "stage": "request", "name": "chat", "outcome": trace.outcome, "ms": round(total * 1000, 3),
+            "first_byte_ms": round(first_byte * 1000, 3) if first_byte is not None else None,
+            "stream_write_ms": round(trace.write_seconds * 1000, 3),
+            "agent_loops": trace.agent_loops, "tool_calls": trace.tool_calls,
+        })
+
+def log_failure(stage: str):
+    """Counts the failure and logs the active exception with the request ID it belongs to."""
+    STAGE_ERRORS.labels(stage.lower(), "failure").inc()
+    if TRACE_JSON:
+        emit({"stage": stage.lower(), "name": "failure", "error": traceback.format_exc()})
+        return
+    print(f"\n--- [JANUS {stage} FAILURE] request={request_id()} ---")
+    traceback.print_exc()
+    print("---------------------------------\n")
+
+# --- EXPORT ---
+def render_metrics():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
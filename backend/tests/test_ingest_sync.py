@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import ingest
+
+
+class CrashingIndex:
+    """Pinecone stand-in: holds IDs in a set, and the first `failures` upserts raise."""
+
+    def __init__(self, failures=0):
+        self.ids = set()
+        self.failures = failures
+
+    def upsert(self, vectors, show_progress=False):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("pinecone went away")
+        self.ids |= {v["id"] for v in vectors}
+
+    def delete(self, ids):
+        self.ids -= set(ids)
+
+
+def make_chunks(prefix, n):
+    chunks = [Document(page_content=f"{prefix} clause {i}", metadata={"chunk_id": f"{prefix}-{i}"}) for i in range(n)]
+    return chunks, np.zeros((n, 384), dtype=np.float32)
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_DIR", str(tmp_path))
+    monkeypatch.setattr(ingest, "MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    return {"files": {}}
+
+
+def test_rerun_after_crashed_upsert_writes_every_chunk(manifest):
+    index = CrashingIndex(failures=1)
+    chunks, vectors = make_chunks("a", 5)
+    with pytest.raises(ConnectionError):
+        ingest.sync_pinecone(index, "regs.pdf", chunks, vectors, manifest, "sha1")
+    assert index.ids == set()
+
+    ingest.sync_pinecone(index, "regs.pdf", chunks, vectors, manifest, "sha1")
+    assert index.ids == {c.metadata["chunk_id"] for c in chunks}
+    assert manifest["files"]["regs.pdf"]["chunks"] == [c.metadata["chunk_id"] for c in chunks]
+    assert "pending" not in manifest["files"]["regs.pdf"]
+
+
+def test_rerun_after_crash_deletes_ids_the_crashed_run_left_behind(manifest):
+    index = CrashingIndex()
+    old_chunks, old_vectors = make_chunks("a", 3)
+    ingest.sync_pinecone(index, "regs.pdf", old_chunks, old_vectors, manifest, "sha1")
+
+    # The file changes; its sync dies after Pinecone has taken the new IDs but before the manifest says so
+    new_chunks, new_vectors = make_chunks("b", 4)
+    index.delete = lambda ids: (_ for _ in ()).throw(ConnectionError("pinecone went away"))
+    with pytest.raises(ConnectionError):
+        ingest.sync_pinecone(index, "regs.pdf", new_chunks, new_vectors, manifest, "sha2")
+    del index.delete
+
+    # Back to the old content: the crashed run's IDs are stale now and must go
+    ingest.sync_pinecone(index, "regs.pdf", old_chunks, old_vectors, manifest, "sha1")
+    assert index.ids == {c.metadata["chunk_id"] for c in old_chunks}
+
+
+def test_chunker_change_re_upserts_unchanged_ids(manifest, monkeypatch):
+    index = CrashingIndex()
+    chunks, vectors = make_chunks("a", 3)
+    ingest.sync_pinecone(index, "regs.pdf", chunks, vectors, manifest, "sha1")
+
+    upserted = []
+    index.upsert = lambda vectors, show_progress=False: upserted.extend(v["id"] for v in vectors)
+    ingest.sync_pinecone(index, "regs.pdf", chunks, vectors, manifest, "sha1")
+    assert upserted == []
+
+    monkeypatch.setattr(ingest, "CHUNKER_VERSION", "articles-300-2400")
+    ingest.sync_pinecone(index, "regs.pdf", chunks, vectors, manifest, "sha1")
+    assert sorted(upserted) == sorted(c.metadata["chunk_id"] for c in chunks)
+    assert manifest["files"]["regs.pdf"]["chunker"] == "articles-300-2400"